@@ -0,0 +1,171 @@
+"""
+自适应并发限制器 (AIMD), 可以直接替换 asyncio.Semaphore: `async with limiter: ...`
+
+- 加性增: 每完成一轮 (limit 个请求) 计算一次吞吐量和平均延迟,
+  吞吐量还在上升, 或者延迟没有比最低水平明显升高 (说明还没有排队), 就把 limit + 1;
+  吞吐量不再上升而延迟已经升高, 说明多出来的请求只是在服务器上排队, 把 limit - 1
+  - 最低延迟水平是真正的最小值, 只随时间缓慢上浮 (每秒 base_decay), 不会跟着排队延迟一起涨
+- 乘性减: 出现延迟突增、超时、429、5xx 或连接错误时把 limit 乘以 decrease
+  - 延迟突增: 最近 recent 个请求的中位数超过最近 window 个请求中位数的 latency_spike 倍;
+    前 warmup 个请求只收集样本, 单个慢请求不会触发
+  - 本地错误 (写文件失败、解码失败等) 和其他状态码不算过载
+- 同一时刻之前发出的请求只会触发一次减小 (类似 TCP 每个 RTT 只减一次), 避免连续腰斩
+"""
+
+import asyncio
+import statistics
+import time
+from collections import deque
+
+import httpx
+
+# 说明服务器 (或到服务器的网络) 扛不住的异常; 其他异常是本地问题, 减小并发也没用
+OVERLOAD_ERRORS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    httpx.TimeoutException,
+    httpx.NetworkError,
+    httpx.RemoteProtocolError,
+)
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: int = 1,
+        decrease: float = 0.5,
+        latency_spike: float = 2.0,
+        tolerance: float = 0.05,
+        window: int = 50,
+        recent: int = 5,
+        warmup: int = 20,
+        base_decay: float = 0.01,
+    ):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_spike = latency_spike  # 最近几个请求的延迟中位数超过整体中位数的多少倍算突增
+        self.recent = recent
+        self.warmup = warmup
+        self.tolerance = tolerance  # 吞吐量至少提升多少才算 "还在上升"
+        self.queueing = 1.25  # 一轮平均延迟超过最低水平的多少倍算开始排队
+        self.base_decay = base_decay  # 最低延迟水平每秒上浮的比例, 网络整体变慢后仍然能继续探测
+
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.backoffs = 0
+        self.throughput = 0.0  # 最近一轮的吞吐量 (请求/秒)
+        self.avg_latency: float | None = None  # 最近 window 个请求的延迟中位数
+        self.peak_limit = initial
+        self.history: list[tuple[float, int, float]] = []  # (时间, limit, 吞吐量)
+
+        self._best_throughput = 0.0
+        self._window_start = time.perf_counter()
+        self._window_done = 0
+        self._window_latency = 0.0
+        self._base_latency: float | None = None
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._last_decrease = 0.0
+        self._started: dict[asyncio.Task, float] = {}
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        self._started[asyncio.current_task()] = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        started = self._started.pop(asyncio.current_task())
+
+        if exc is None:
+            self._on_success(started, time.perf_counter() - started)
+        elif self._is_overload(exc):
+            self.failed += 1
+            self._on_overload(started)
+
+        async with self._condition:
+            self.in_flight -= 1
+            # 只唤醒能拿到名额的等待者, 避免成百上千个等待任务同时被唤醒
+            self._condition.notify(self.limit - self.in_flight)
+
+    @staticmethod
+    def _is_overload(exc: BaseException) -> bool:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        if status is not None:
+            return status == 429 or status >= 500
+        return isinstance(exc, OVERLOAD_ERRORS)
+
+    def _latency_spiked(self, latency: float) -> bool:
+        """记录一个样本; 预热结束后, 最近 recent 个的中位数明显高于整体中位数才算突增"""
+        self._latencies.append(latency)
+        self.avg_latency = statistics.median(self._latencies)
+        if len(self._latencies) < max(self.warmup, self.recent):
+            return False
+        recent = statistics.median(list(self._latencies)[-self.recent:])
+        return recent > self.avg_latency * self.latency_spike
+
+    def _on_success(self, started: float, latency: float):
+        self.completed += 1
+        self._window_done += 1
+        self._window_latency += latency
+
+        if self._latency_spiked(latency):
+            self._on_overload(started)
+            return
+
+        if self._window_done < self.limit:
+            return
+
+        now = time.perf_counter()
+        self.throughput = self._window_done / (now - self._window_start)
+        window_latency = self._window_latency / self._window_done
+        # 按经过的时间上浮, 不按轮次: 每轮 limit + 1 带来的排队延迟涨幅总是比它大
+        if self._base_latency is None:
+            self._base_latency = window_latency
+        else:
+            drift = (1 + self.base_decay) ** (now - self._window_start)
+            self._base_latency = min(window_latency, self._base_latency * drift)
+
+        rising = self.throughput > self._best_throughput * (1 + self.tolerance)
+        not_queueing = window_latency <= self._base_latency * self.queueing
+        self._best_throughput = max(self._best_throughput, self.throughput)
+        if rising or not_queueing:
+            self.limit = min(self.max_limit, self.limit + self.increase)
+            self.peak_limit = max(self.peak_limit, self.limit)
+        else:
+            self.limit = max(self.min_limit, self.limit - self.increase)
+
+        self.history.append((now, self.limit, self.throughput))
+        self._window_start = now
+        self._window_done = 0
+        self._window_latency = 0.0
+
+    def _on_overload(self, started: float):
+        if started < self._last_decrease:
+            return  # 这个请求在上一次减小之前就发出了, 不重复惩罚
+
+        now = time.perf_counter()
+        self.limit = max(self.min_limit, int(self.limit * self.decrease))
+        self.backoffs += 1
+        self._last_decrease = now
+        # 重新开始探测: 减小之后只要吞吐量回升就继续加
+        self._best_throughput = 0.0
+        self._window_start = now
+        self._window_done = 0
+        self._window_latency = 0.0
+        self.history.append((now, self.limit, self.throughput))
+
+    def summary(self) -> str:
+        return (
+            f"limit={self.limit} (peak {self.peak_limit}), "
+            f"throughput={self.throughput:.2f} req/s, "
+            f"completed={self.completed}, failed={self.failed}, backoffs={self.backoffs}"
+        )
@@ -0,0 +1,371 @@
+"""
+对比 real_world_example_sync_v1 / async_v1 / async_v2 / async_v3 的基准测试。
+
+- 在本进程启动替身服务器 (fixture_server.py), 图片数量、尺寸和模拟延迟都可以配置
+- 每个版本在独立的子进程里运行, 互不影响内存和 CPU 统计
+- 记录总耗时、CPU 时间 (含进程池子进程)、峰值 RSS, 以及下载/处理两个阶段单张图片耗时的分位数;
+  async_v3 的共享内存 (async_v3_shm) 和分条带 (async_v3_tiled) 模式另外记录解码/边缘检测/保存的耗时
+- 结果写入 JSON; 指定 --baseline 时与之前保存的结果对比, 变慢/变大超过阈值就标记为回归并返回非 0
+
+    python benchmark.py --images 12 --size 1920x1080 --latency 0.05 --repeat 3
+    python benchmark.py --save-baseline            # 把这次的结果保存为基线
+    python benchmark.py --baseline benchmark_baseline.json
+    python benchmark.py --variants async_v3 async_v3_shm async_v3_tiled
+
+进程池里的子进程依赖 fork 继承被替换的函数和目录设置, 所以只支持 Linux / macOS。
+"""
+
+import argparse
+import asyncio
+import importlib
+import inspect
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from fixture_server import FixtureServer
+
+# 版本名 -> (模块, 运行前覆盖的模块级配置)
+VARIANTS = {
+    "sync_v1": ("real_world_example_sync_v1", {}),
+    "async_v1": ("real_world_example_async_v1", {}),
+    "async_v2": ("real_world_example_async_v2", {}),
+    "async_v3": ("real_world_example_async_v3", {}),
+    "async_v3_shm": ("real_world_example_async_v3", {"USE_SHARED_MEMORY": True}),
+    "async_v3_tiled": ("real_world_example_async_v3", {"TILE_STRIPS": 4}),
+}
+DEFAULT_VARIANTS = ["sync_v1", "async_v1", "async_v2", "async_v3"]
+# 阶段 -> 可能实现这个阶段的函数 (模块里有哪个就包装哪个)
+STAGE_FUNCTIONS = {
+    "download": ("download_single_image", "download_to_shared_memory"),
+    "process": ("process_single_image", "process_shared_image"),
+    # 共享内存 / 分条带模式下 process 的组成部分, 在进程池子进程里执行; edge 是每个条带一次
+    "decode": ("decode_shared_image",),
+    "edge": ("edge_shared_image",),
+    "save": ("save_shared_image",),
+}
+PERCENTILES = (50, 95, 99)
+REGRESSION_THRESHOLD = 0.10  # 比基线差 10% 以上算回归
+DEFAULT_OUTPUT = Path("benchmark_results.json")
+DEFAULT_BASELINE = Path("benchmark_baseline.json")
+
+
+# ---------- 子进程: 运行单个版本 ----------
+
+
+class StageTimer:
+    """包装下载/处理函数, 每次调用结束后把耗时追加到 timings 文件 (进程池里的子进程也能写)
+
+    原函数按名字 (module_name.func_name) 查找, 计时器自己只保存字符串, 交给进程池时可以直接 pickle。
+    """
+
+    def __init__(self, stage: str, module_name: str, func_name: str, timings_path: str):
+        self.stage = stage
+        self.module_name = module_name
+        self.func_name = func_name
+        self.timings_path = timings_path
+
+    @property
+    def func(self):
+        return getattr(sys.modules[self.module_name], self.func_name)
+
+    def record(self, start: float):
+        line = json.dumps({"stage": self.stage, "seconds": time.perf_counter() - start})
+        with open(self.timings_path, "a") as f:
+            f.write(line + "\n")
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            self.record(start)
+
+
+class AsyncStageTimer(StageTimer):
+    async def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await self.func(*args, **kwargs)
+        finally:
+            self.record(start)
+
+
+def install_timers(module, timings_path: str):
+    for stage, names in STAGE_FUNCTIONS.items():
+        for name in names:
+            func = getattr(module, name, None)
+            if func is None:
+                continue
+            # 原函数换个名字留在模块里, 计时器按这个名字调用它
+            alias = f"_untimed_{name}"
+            setattr(module, alias, func)
+
+            timer_cls = AsyncStageTimer if inspect.iscoroutinefunction(func) else StageTimer
+            setattr(module, name, timer_cls(stage, module.__name__, alias, timings_path))
+
+
+def cpu_seconds() -> float | None:
+    if resource is None:
+        return None
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def peak_rss_mb(who) -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux 单位是 KB, macOS 是字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(spec: dict):
+    if "fork" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("fork")
+
+    module = importlib.import_module(spec["module"])
+    for name, value in spec["overrides"].items():
+        setattr(module, name, value)
+    workdir = Path(spec["workdir"])
+    module.IMAGE_URLS = spec["urls"]
+    module.ORIGINAL_DIR = workdir / "original_images"
+    module.PROCESSED_DIR = workdir / "processed_images"
+    install_timers(module, spec["timings"])
+
+    start = time.perf_counter()
+    if inspect.iscoroutinefunction(module.main):
+        asyncio.run(module.main())
+    else:
+        module.main()
+    wall_time = time.perf_counter() - start
+
+    result = {
+        "wall_time": wall_time,
+        "cpu_time": cpu_seconds(),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        "peak_child_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+    }
+    Path(spec["result"]).write_text(json.dumps(result))
+
+
+# ---------- 主进程: 调度与统计 ----------
+
+
+def percentile(values: list[float], p: float) -> float:
+    """最近秩法 (nearest-rank)"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))  # ceil
+    return ordered[int(rank) - 1]
+
+
+def stage_percentiles(timings_path: Path) -> dict[str, dict[str, float]]:
+    samples: dict[str, list[float]] = {}
+    if timings_path.exists():
+        for line in timings_path.read_text().splitlines():
+            record = json.loads(line)
+            samples.setdefault(record["stage"], []).append(record["seconds"])
+
+    return {
+        stage: {
+            "count": len(values),
+            **{f"p{p}": percentile(values, p) for p in PERCENTILES},
+            "max": max(values),
+        }
+        for stage, values in samples.items()
+    }
+
+
+def run_variant(name: str, urls: list[str], repeat: int) -> dict:
+    runs = []
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as tmp:
+        tmp = Path(tmp)
+        timings_path = tmp / "timings.jsonl"
+        for i in range(repeat):
+            workdir = tmp / f"run_{i}"
+            for sub in ("original_images", "processed_images"):
+                (workdir / sub).mkdir(parents=True)
+            module, overrides = VARIANTS[name]
+            spec = {
+                "module": module,
+                "overrides": overrides,
+                "urls": urls,
+                "workdir": str(workdir),
+                "timings": str(timings_path),
+                "result": str(workdir / "result.json"),
+            }
+            subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), "--worker", json.dumps(spec)],
+                cwd=workdir,
+                env={**os.environ, "PYTHONPATH": str(Path(__file__).resolve().parent)},
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+            runs.append(json.loads(Path(spec["result"]).read_text()))
+            print(f"  {name} run {i + 1}/{repeat}: {runs[-1]['wall_time']:.2f}s")
+
+        stages = stage_percentiles(timings_path)
+
+    def median(key):
+        values = [run[key] for run in runs if run[key] is not None]
+        return statistics.median(values) if values else None
+
+    def peak(key):
+        values = [run[key] for run in runs if run[key] is not None]
+        return max(values) if values else None
+
+    return {
+        "wall_time": median("wall_time"),
+        "cpu_time": median("cpu_time"),
+        "peak_rss_mb": peak("peak_rss_mb"),
+        "peak_child_rss_mb": peak("peak_child_rss_mb"),
+        "runs": runs,
+        "stages": stages,
+    }
+
+
+def regression_metrics(result: dict) -> dict[str, float]:
+    """参与回归对比的指标: 越小越好"""
+    metrics = {
+        "wall_time": result["wall_time"],
+        "cpu_time": result["cpu_time"],
+        "peak_rss_mb": result["peak_rss_mb"],
+    }
+    for stage, stats in result["stages"].items():
+        metrics[f"{stage}_p95"] = stats["p95"]
+    return {k: v for k, v in metrics.items() if v is not None}
+
+
+def find_regressions(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    if current["config"] != baseline["config"]:
+        print(
+            "Warning: baseline was recorded with a different workload "
+            f"({baseline['config']} vs {current['config']}), comparison may be meaningless"
+        )
+
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        old_metrics = regression_metrics(baseline["results"][name])
+        for metric, value in regression_metrics(result).items():
+            old = old_metrics.get(metric)
+            if old and value > old * (1 + threshold):
+                regressions.append(
+                    {
+                        "variant": name,
+                        "metric": metric,
+                        "baseline": old,
+                        "current": value,
+                        "change": value / old - 1,
+                    }
+                )
+    return regressions
+
+
+def print_table(results: dict[str, dict]):
+    def fmt(value, spec=".2f"):
+        return "-" if value is None else format(value, spec)
+
+    print(
+        f"\n{'variant':<15}{'wall s':>9}{'cpu s':>9}{'rss MB':>9}{'child MB':>10}"
+        f"{'dl p50':>9}{'dl p95':>9}{'proc p50':>10}{'proc p95':>10}"
+    )
+    for name, result in results.items():
+        dl = result["stages"].get("download", {})
+        proc = result["stages"].get("process", {})
+        print(
+            f"{name:<15}{fmt(result['wall_time']):>9}{fmt(result['cpu_time']):>9}"
+            f"{fmt(result['peak_rss_mb'], '.1f'):>9}{fmt(result['peak_child_rss_mb'], '.1f'):>10}"
+            f"{fmt(dl.get('p50')):>9}{fmt(dl.get('p95')):>9}"
+            f"{fmt(proc.get('p50')):>10}{fmt(proc.get('p95')):>10}"
+        )
+
+
+def parse_size(text: str) -> tuple[int, int]:
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=DEFAULT_VARIANTS)
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--size", type=parse_size, default=(1920, 1080), help="例如 1920x1080")
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的模拟延迟 (秒)")
+    parser.add_argument("--repeat", type=int, default=1, help="每个版本运行几次, 取中位数")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, help="与这个结果文件对比, 标记回归")
+    parser.add_argument("--save-baseline", action="store_true", help=f"同时写入 {DEFAULT_BASELINE}")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(json.loads(args.worker))
+        return
+
+    config = {
+        "images": args.images,
+        "size": list(args.size),
+        "latency": args.latency,
+    }
+    report = {
+        "config": config,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": {},
+    }
+
+    with FixtureServer(image_count=args.images, size=args.size, latency=args.latency) as server:
+        for name in args.variants:
+            print(f"Running {name}...")
+            report["results"][name] = run_variant(name, server.urls, args.repeat)
+
+    print_table(report["results"])
+
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = find_regressions(report, baseline, args.threshold)
+        report["baseline"] = str(args.baseline)
+        report["regressions"] = regressions
+        if regressions:
+            print(f"\nRegressions against {args.baseline} (> {args.threshold:.0%}):")
+            for r in regressions:
+                print(
+                    f"  {r['variant']} {r['metric']}: {r['baseline']:.3f} -> "
+                    f"{r['current']:.3f} (+{r['change']:.0%})"
+                )
+        else:
+            print(f"\nNo regressions against {args.baseline}")
+
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {DEFAULT_BASELINE}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+本地 HTTP 替身服务器: 在内存中生成 JPEG 测试图片, 用来离线运行 real_world_example_* 示例。
+
+    with FixtureServer(image_count=12) as server:
+        urls = server.urls  # http://127.0.0.1:<port>/image_1.jpg ...
+"""
+
+import hashlib
+import io
+import random
+import re
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import numpy as np
+from PIL import Image
+
+
+def make_fixture_image(seed: int, size: tuple[int, int] = (1920, 1080)) -> bytes:
+    width, height = size
+    rng = np.random.default_rng(seed)
+
+    # 渐变背景 + 若干色块 + 少量噪声, 保证边缘检测有东西可检测
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    for c in range(3):
+        fx, fy = rng.uniform(0.02, 0.2, size=2)
+        pixels[:, :, c] = (x * fx + y * fy + rng.uniform(0, 255)) % 256
+
+    for _ in range(8):
+        x0, x1 = sorted(rng.integers(0, width, size=2))
+        y0, y1 = sorted(rng.integers(0, height, size=2))
+        pixels[y0:y1, x0:x1] = rng.integers(0, 256, size=3)
+
+    pixels += rng.normal(0, 4, size=pixels.shape)
+    img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive, 客户端可以复用连接
+
+    def do_GET(self):
+        name = urlsplit(self.path).path.lstrip("/")  # 忽略 ?ts= 之类的查询参数
+        body = self.server.images.get(name)
+
+        with self.server.lock:
+            self.server.active += 1
+            overloaded = (
+                self.server.max_concurrent is not None
+                and self.server.active > self.server.max_concurrent
+            )
+        try:
+            if overloaded:
+                self.send_error(429)  # 模拟限流
+                return
+            self.serve_image(body)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def serve_image(self, body: bytes | None):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if body is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.not_modified(etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.server.flaky and random.random() < self.server.flaky:
+            if random.random() < 0.5:
+                self.send_error(503)  # 模拟服务器临时故障
+                return
+            truncate = True  # 模拟传输到一半连接断开
+        else:
+            truncate = False
+
+        start = self.range_start(etag, len(body))
+        if start is None:
+            self.send_response(200)
+            start = 0
+        else:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        payload = body[start:]
+
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(self.server.started, usegmt=True))
+        self.end_headers()
+
+        if truncate:
+            self.wfile.write(payload[: len(payload) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(payload)
+
+    def range_start(self, etag: str, size: int) -> int | None:
+        """只支持 "bytes=N-" 形式; If-Range 与当前 ETag 不一致时按规范返回完整内容"""
+        match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if match is None:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range != etag:
+            return None
+        start = int(match.group(1))
+        return start if start < size else None
+
+    def not_modified(self, etag: str) -> bool:
+        # 与 HTTP 规范一致: 有 If-None-Match 时忽略 If-Modified-Since
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(self.server.started) <= since
+
+        return False
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    def __init__(
+        self,
+        image_count: int = 12,
+        size: tuple[int, int] = (1920, 1080),
+        latency: float = 0.0,
+        max_concurrent: int | None = None,
+        flaky: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.images = {
+            f"image_{i}.jpg": make_fixture_image(i, size)
+            for i in range(1, image_count + 1)
+        }
+        self.latency = latency
+        self.max_concurrent = max_concurrent  # 同时处理的请求超过这个数就返回 429
+        self.flaky = flaky  # 每个请求以这个概率返回 503 或者只发送一半就断开
+        self.address = (host, port)
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self) -> list[str]:
+        return [f"{self.base_url}/{name}" for name in self.images]
+
+    def start(self) -> "FixtureServer":
+        self.httpd = ThreadingHTTPServer(self.address, FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.images = self.images
+        self.httpd.latency = self.latency
+        self.httpd.started = time.time()
+        self.httpd.max_concurrent = self.max_concurrent
+        self.httpd.flaky = self.flaky
+        self.httpd.active = 0
+        self.httpd.lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    with FixtureServer(port=8000) as server:
+        print(f"Serving {len(server.images)} fixture images at {server.base_url}")
+        for url in server.urls:
+            print(f"  {url}")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,84 @@
+"""
+可配置的 httpx 连接池, 以及连接复用统计。
+
+- PoolConfig: 最大连接数、保持 keep-alive 的连接数与过期时间、是否启用 HTTP/2
+- make_client(config, stats): 按配置创建 AsyncClient; 同一个 client 可以在多次运行之间共享, 连接不用重新建立
+- ConnectionStats: 通过 httpx 的 trace 扩展统计新建了多少 TCP 连接, 其余请求都是复用已有连接
+
+HTTP/2 需要安装 h2 (pip install "httpx[http2]"), 并且只会在 https 上通过 ALPN 协商启用;
+没有安装 h2 时退回 HTTP/1.1。
+"""
+
+import importlib.util
+from typing import NamedTuple
+
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class PoolConfig(NamedTuple):
+    max_connections: int | None = 100  # 同时打开的连接上限, 超过时请求在连接池里排队
+    max_keepalive_connections: int | None = 20  # 请求结束后保留多少空闲连接, 0 表示不复用
+    keepalive_expiry: float | None = 5.0  # 空闲连接保留多少秒
+    http2: bool = False
+    timeout: float = 5.0
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class ConnectionStats:
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.http_versions: dict[str, int] = {}
+
+    @property
+    def reused(self) -> int:
+        return max(0, self.requests - self.connections)
+
+    async def trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections += 1
+
+    async def on_request(self, request: httpx.Request):
+        self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def on_response(self, response: httpx.Response):
+        version = response.http_version
+        self.http_versions[version] = self.http_versions.get(version, 0) + 1
+
+    def summary(self) -> str:
+        reuse_rate = self.reused / self.requests * 100 if self.requests else 0.0
+        versions = ", ".join(f"{v}: {n}" for v, n in sorted(self.http_versions.items()))
+        return (
+            f"requests={self.requests}, new connections={self.connections}, "
+            f"reused={self.reused} ({reuse_rate:.2f}% reuse), versions=[{versions}]"
+        )
+
+
+def make_client(
+    config: PoolConfig = PoolConfig(),
+    stats: ConnectionStats | None = None,
+) -> httpx.AsyncClient:
+    http2 = config.http2
+    if http2 and not HTTP2_AVAILABLE:
+        print('h2 is not installed, falling back to HTTP/1.1 (pip install "httpx[http2]")')
+        http2 = False
+
+    event_hooks = {}
+    if stats is not None:
+        event_hooks = {"request": [stats.on_request], "response": [stats.on_response]}
+
+    return httpx.AsyncClient(
+        limits=config.limits(),
+        http2=http2,
+        timeout=config.timeout,
+        event_hooks=event_hooks,
+    )
@@ -0,0 +1,108 @@
+"""
+连接池配置对比: 对本地替身服务器发同样数量的请求, 比较每种配置的吞吐量 (请求/秒) 和连接复用次数。
+
+每种配置使用同一个 client 连续跑 ROUNDS 轮, 第二轮起可以看到跨运行复用连接的效果。
+
+    python pool_benchmark.py --requests 400 --concurrency 32 --latency 0.005
+
+注意: 替身服务器只支持 HTTP/1.1 (明文 http 上 httpx 也不会协商 HTTP/2),
+所以 http2 这一行在本地主要用来确认配置能正常工作, 真正的多路复用要对 https 服务器测。
+"""
+
+import argparse
+import asyncio
+import time
+
+from fixture_server import FixtureServer
+from http_pool import ConnectionStats, PoolConfig, make_client
+
+CONFIGS = {
+    "httpx default": PoolConfig(),
+    "no keep-alive": PoolConfig(max_keepalive_connections=0),
+    "pool 4": PoolConfig(max_connections=4, max_keepalive_connections=4),
+    "pool 32": PoolConfig(max_connections=32, max_keepalive_connections=32),
+    "pool 32, short expiry": PoolConfig(
+        max_connections=32, max_keepalive_connections=32, keepalive_expiry=0.05
+    ),
+    "pool 32, http2": PoolConfig(
+        max_connections=32, max_keepalive_connections=32, http2=True
+    ),
+}
+ROUNDS = 2
+ROUND_PAUSE = 0.2  # 两轮之间停顿一下, 让 keepalive_expiry 很短的连接过期
+
+
+async def fetch_all(client, urls: list[str], concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(url: str):
+        async with semaphore:
+            response = await client.get(url)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fetch(url) for url in urls))
+    return time.perf_counter() - start
+
+
+async def bench_config(
+    name: str, config: PoolConfig, urls: list[str], concurrency: int
+) -> list[dict]:
+    stats = ConnectionStats()
+    results = []
+    async with make_client(config, stats) as client:
+        for round_num in range(1, ROUNDS + 1):
+            requests_before = stats.requests
+            connections_before = stats.connections
+            versions_before = dict(stats.http_versions)
+
+            elapsed = await fetch_all(client, urls, concurrency)
+
+            requests = stats.requests - requests_before
+            connections = stats.connections - connections_before
+            results.append(
+                {
+                    "config": name,
+                    "round": round_num,
+                    "req_per_sec": requests / elapsed,
+                    "connections": connections,
+                    "reused": requests - connections,
+                    "versions": {
+                        v: n - versions_before.get(v, 0)
+                        for v, n in stats.http_versions.items()
+                    },
+                }
+            )
+            await asyncio.sleep(ROUND_PAUSE)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.005, help="每个请求的模拟延迟 (秒)")
+    args = parser.parse_args()
+
+    with FixtureServer(
+        image_count=args.images, size=(320, 240), latency=args.latency
+    ) as server:
+        urls = [server.urls[i % args.images] for i in range(args.requests)]
+
+        print(
+            f"{args.requests} requests, concurrency {args.concurrency}, "
+            f"latency {args.latency * 1000:.1f} ms\n"
+        )
+        print(f"{'config':<24}{'round':>6}{'req/s':>10}{'new conns':>11}{'reused':>8}  versions")
+        for name, config in CONFIGS.items():
+            for row in await bench_config(name, config, urls, args.concurrency):
+                versions = ", ".join(f"{v}: {n}" for v, n in row["versions"].items())
+                print(
+                    f"{row['config']:<24}{row['round']:>6}{row['req_per_sec']:>10.1f}"
+                    f"{row['connections']:>11}{row['reused']:>8}  {versions}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,16 +1,56 @@
 import asyncio
+import hashlib
+import io
 import os
+import random
 import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
+from typing import NamedTuple, TypeVar
 
 import aiofiles
 import httpx
+import numpy as np
 from PIL import Image
 
+from adaptive_limiter import AdaptiveLimiter
+from fixture_server import FixtureServer
+from http_pool import ConnectionStats, PoolConfig, make_client
+from result_cache import ResultCache
+from write_behind import MemoryBudget, WriteBehindFile
+
 DOWNLOAD_LIMIT = 4
+ADAPTIVE_DOWNLOAD_LIMIT = True  # True: 从 DOWNLOAD_LIMIT 开始按 AIMD 自动调整并发下载数
+DOWNLOAD_LIMIT_MAX = 32
+DOWNLOAD_RETRIES = 3  # 超时/连接错误/429/5xx 时每张图片最多重试几次
+RETRY_BACKOFF = 0.5  # 指数退避基数 (秒), 第 n 次重试前随机等待 [0, RETRY_BACKOFF * 2**n]
+COLLECT_FAILURES = True  # True: 单张图片失败只记录下来, 不取消其他下载
+# 连接池: 连接数上限不低于最大并发下载数, 空闲连接保留到下一次运行还能复用
+# http2=True 需要安装 h2, 并且只对 https 生效
+HTTP_POOL = PoolConfig(
+    max_connections=DOWNLOAD_LIMIT_MAX,
+    max_keepalive_connections=DOWNLOAD_LIMIT_MAX,
+    keepalive_expiry=30.0,
+    http2=False,
+)
+RUNS = 1  # 连续运行几次, 共享同一个连接池 (和结果缓存)
+WRITE_BEHIND = True  # True: 攒成大块后台写盘; False: 每 8 KiB await 一次 aiofiles
+WRITE_BUFFER_SIZE = 1024 * 1024  # 每个下载攒够这么多字节写一次盘
+WRITE_MEMORY_LIMIT = 64 * 1024 * 1024  # 所有下载加起来最多缓冲这么多还没写盘的字节, 不能小于 WRITE_BUFFER_SIZE
 CPU_WORKERS = os.cpu_count()
 
+PIPELINE = True  # True: 下载完成一张就立刻送去处理; False: 先全部下载再全部处理
+PIPELINE_QUEUE_SIZE = CPU_WORKERS * 2  # 下载 -> 处理 之间的有界队列, 满了会让下载等待
+USE_SHARED_MEMORY = False  # True: 下载的字节/解码后的帧/边缘结果都放在共享内存, 进程间只传块名
+TILE_STRIPS = 1  # >1: 单张图片切成多条水平条带并行做边缘检测 (适合 8K 之类的大图)
+USE_FIXTURE_SERVER = False  # True: 使用本地替身服务器 (fixture_server.py), 可离线运行
+USE_RESULT_CACHE = False  # True: 按内容哈希缓存处理结果, 并用 ETag/Last-Modified 做条件请求
+CACHE_DIR = Path("cache")
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
 
 IMAGE_URLS = [
     "https://images.unsplash.com/photo-1516117172878-fd2c41f4a759?w=1920&h=1080&fit=crop",
@@ -31,101 +71,299 @@ IMAGE_URLS = [
 ORIGINAL_DIR = Path("original_images")
 PROCESSED_DIR = Path("processed_images")
 
+EDGE_THRESHOLD = 30
+EDGE_BACKEND = "numpy"  # "python": 原始逐像素循环, "numpy": 数组整体运算
+RESULT_VERSION = f"edge-t{EDGE_THRESHOLD}-v1"  # 算法改动时修改, 旧的缓存结果自动失效
+
+
+T = TypeVar("T")
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(e, httpx.TransportError)  # 超时 / 连接断开 / 响应体不完整
+
+
+async def with_retries(url: str, attempt: Callable[[], Awaitable[T]]) -> T:
+    for retry in range(DOWNLOAD_RETRIES + 1):
+        try:
+            return await attempt()
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            if retry == DOWNLOAD_RETRIES or not is_retryable(e):
+                raise
+            # full jitter: 避免大量失败的请求在同一时刻一起重试
+            delay = random.uniform(0, RETRY_BACKOFF * 2**retry)
+            print(f"Retrying {url} in {delay:.2f}s after {e!r}")
+            await asyncio.sleep(delay)
+
+
+def build_request(
+    url: str, cache: ResultCache | None, offset: int = 0, etag: str | None = None
+) -> tuple[str, dict[str, str]]:
+    if cache is None:
+        ts = int(time.time())
+        request_url = f"{url}?ts={ts}"  # Add timestamp to avoid caching issues
+        headers = {}
+    else:
+        # 使用缓存时 URL 必须保持不变, 才能做条件请求
+        request_url = url
+        headers = cache.conditional_headers(url)
+
+    if offset:
+        # 断点续传: 只请求还没下载的部分; 资源变了 (ETag 不同) 服务器会返回完整的 200
+        headers["Range"] = f"bytes={offset}-"
+        if etag is not None:
+            headers["If-Range"] = etag
+
+    return request_url, headers
+
+
+async def not_modified(
+    response: httpx.Response, url: str, cache: ResultCache | None
+) -> bool:
+    """处理条件请求的结果: 304 时读完 (空的) 响应体, 连接才能回到连接池复用;
+    其他情况解除 conditional_headers 对旧结果的固定, 旧结果之后不会被取用, 可以正常淘汰
+    """
+    if cache is None:
+        return False
+    if response.status_code == 304:
+        await response.aread()
+        cache.not_modified += 1
+        print(f"Not modified: {url}")
+        return True
+    cache.unpin(url)
+    return False
+
 
 async def download_single_image(
     client: httpx.AsyncClient,
     url: str,
     img_num: int,
-    semaphore: asyncio.Semaphore,
-) -> Path:
-    async with semaphore:
-        print(f"Downloading {url}...")
-        ts = int(time.time())
-        url = f"{url}?ts={ts}"  # Add timestamp to avoid caching issues
-
-        response = await client.get(url, timeout=10, follow_redirects=True)
-        response.raise_for_status()
+    semaphore: asyncio.Semaphore | AdaptiveLimiter,
+    cache: ResultCache | None = None,
+    write_budget: MemoryBudget | None = None,
+) -> Path | None:
+    """返回 None 表示服务器回复 304, 结果直接从缓存取
+
+    先写到 .part 文件, 失败重试时用 Range 请求从已下载的位置继续, 不浪费已经下载的数据。
+    write_budget 由同一批下载共享, 限制还没写盘的缓冲字节总数。
+    """
+    if write_budget is None:
+        write_budget = MemoryBudget(WRITE_MEMORY_LIMIT)
+    filename = f"image_{img_num}.jpg"
+    download_path = ORIGINAL_DIR / filename
+    part_path = ORIGINAL_DIR / f"{filename}.part"
+    part_path.unlink(missing_ok=True)
+    etag = None
+    last_modified = None
+
+    async def attempt() -> Path | None:
+        nonlocal etag, last_modified
+        async with semaphore:
+            print(f"Downloading {url}...")
+            offset = part_path.stat().st_size if part_path.exists() else 0
+            request_url, headers = build_request(url, cache, offset, etag)
+
+            async with client.stream(
+                "GET", request_url, headers=headers, timeout=10, follow_redirects=True
+            ) as response:
+                if await not_modified(response, url, cache):
+                    return None
+                response.raise_for_status()
+
+                if response.status_code == 206:
+                    print(f"Resuming {url} from byte {offset}")
+                else:
+                    offset = 0  # 服务器不支持 Range 或资源已变化, 从头下载
+                etag = response.headers.get("ETag", etag)
+                last_modified = response.headers.get("Last-Modified", last_modified)
+
+                mode = "ab" if offset else "wb"
+                if WRITE_BEHIND:
+                    async with WriteBehindFile(
+                        part_path, mode, write_budget, WRITE_BUFFER_SIZE
+                    ) as f:
+                        # 不指定 chunk_size: 按网络实际收到的大小交给缓冲区, 省去 httpx 的重新分块
+                        async for chunk in response.aiter_bytes():
+                            await f.write(chunk)
+                else:
+                    async with aiofiles.open(part_path, mode) as f:
+                        async for chunk in response.aiter_bytes(chunk_size=8192):
+                            await f.write(chunk)
 
-        filename = f"image_{img_num}.jpg"
-        download_path = ORIGINAL_DIR / filename
+        part_path.replace(download_path)
 
-        async with aiofiles.open(download_path, "wb") as f:
-            async for chunk in response.aiter_bytes(chunk_size=8192):
-                await f.write(chunk)
+        if cache is not None:
+            with download_path.open("rb") as f:
+                content_hash = hashlib.file_digest(f, "sha256").hexdigest()
+            cache.remember(url, content_hash, etag, last_modified)
 
         print(f"Downloaded and saved to: {download_path}")
 
         return download_path
 
+    try:
+        return await with_retries(url, attempt)
+    except BaseException:
+        if cache is not None:
+            cache.unpin(url)  # 所有重试都失败 (包括没收到响应的情况)
+        raise
+
+
+@asynccontextmanager
+async def shared_client(client: httpx.AsyncClient | None) -> AsyncIterator[httpx.AsyncClient]:
+    """传入 client 时直接使用 (由调用者负责关闭), 否则按 HTTP_POOL 临时创建一个"""
+    if client is not None:
+        yield client
+        return
+    async with make_client(HTTP_POOL) as client:
+        yield client
+
+
+def make_download_limiter() -> asyncio.Semaphore | AdaptiveLimiter:
+    if ADAPTIVE_DOWNLOAD_LIMIT:
+        return AdaptiveLimiter(initial=DOWNLOAD_LIMIT, max_limit=DOWNLOAD_LIMIT_MAX)
+    return asyncio.Semaphore(DOWNLOAD_LIMIT)
+
+
+async def download_images(
+    urls: list,
+    cache: ResultCache | None = None,
+    dl_semaphore: asyncio.Semaphore | AdaptiveLimiter | None = None,
+    client: httpx.AsyncClient | None = None,
+    write_budget: MemoryBudget | None = None,
+) -> list[Path | None | Exception]:
+    """COLLECT_FAILURES 时失败的图片在结果列表中对应位置是异常对象"""
+    if dl_semaphore is None:
+        dl_semaphore = make_download_limiter()
+    if write_budget is None:
+        write_budget = MemoryBudget(WRITE_MEMORY_LIMIT)
+    async with shared_client(client) as client:
+        coros = [
+            download_single_image(
+                client, url, img_num, dl_semaphore, cache, write_budget
+            )
+            for img_num, url in enumerate(urls, start=1)
+        ]
 
-async def download_images(urls: list) -> list[Path]:
-    dl_semaphore = asyncio.Semaphore(DOWNLOAD_LIMIT)
-    async with httpx.AsyncClient() as client:
-        async with asyncio.TaskGroup() as tg:
-            tasks = [
-                tg.create_task(
-                    download_single_image(client, url, img_num, dl_semaphore)
-                )
-                for img_num, url in enumerate(urls, start=1)
-            ]
+        if COLLECT_FAILURES:
+            img_paths = await asyncio.gather(*coros, return_exceptions=True)
+        else:
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(coro) for coro in coros]
 
-        img_paths = [task.result() for task in tasks]
+            img_paths = [task.result() for task in tasks]
 
     return img_paths
 
 
-def process_single_image(orig_path: Path) -> Path:
-    save_path = PROCESSED_DIR / orig_path.name
+def edge_image_python(img: Image.Image) -> Image.Image:
+    data = list(img.getdata())
+    width, height = img.size
+    new_data = []
 
-    with Image.open(orig_path) as img:
-        data = list(img.getdata())
-        width, height = img.size
-        new_data = []
-
-        for i in range(len(data)):
-            current_r, current_g, current_b = data[i]
-
-            total_diff = 0
-            neighbor_count = 0
-
-            for dx, dy in [(1, 0), (0, 1)]:
-                x = (i % width) + dx
-                y = (i // width) + dy
-
-                if 0 <= x < width and 0 <= y < height:
-                    neighbor_r, neighbor_g, neighbor_b = data[y * width + x]
-                    diff = (
-                        abs(current_r - neighbor_r)
-                        + abs(current_g - neighbor_g)
-                        + abs(current_b - neighbor_b)
-                    )
-                    total_diff += diff
-                    neighbor_count += 1
-
-            if neighbor_count > 0:
-                edge_strength = total_diff // neighbor_count
-                if edge_strength > 30:
-                    new_data.append((255, 255, 255))
-                else:
-                    new_data.append((0, 0, 0))
+    for i in range(len(data)):
+        current_r, current_g, current_b = data[i]
+
+        total_diff = 0
+        neighbor_count = 0
+
+        for dx, dy in [(1, 0), (0, 1)]:
+            x = (i % width) + dx
+            y = (i // width) + dy
+
+            if 0 <= x < width and 0 <= y < height:
+                neighbor_r, neighbor_g, neighbor_b = data[y * width + x]
+                diff = (
+                    abs(current_r - neighbor_r)
+                    + abs(current_g - neighbor_g)
+                    + abs(current_b - neighbor_b)
+                )
+                total_diff += diff
+                neighbor_count += 1
+
+        if neighbor_count > 0:
+            edge_strength = total_diff // neighbor_count
+            if edge_strength > EDGE_THRESHOLD:
+                new_data.append((255, 255, 255))
             else:
                 new_data.append((0, 0, 0))
+        else:
+            new_data.append((0, 0, 0))
+
+    edge_img = Image.new("RGB", (width, height))
+    edge_img.putdata(new_data)
+    return edge_img
 
-        edge_img = Image.new("RGB", (width, height))
-        edge_img.putdata(new_data)
+
+def edge_mask_numpy(pixels: np.ndarray) -> np.ndarray:
+    # 与 edge_image_python 逐像素结果完全一致, 只是把右侧/下方邻居差值换成整块数组运算
+    pixels = pixels.astype(np.int16)
+    height, width = pixels.shape[:2]
+
+    total_diff = np.zeros((height, width), dtype=np.int32)
+    neighbor_count = np.zeros((height, width), dtype=np.int32)
+
+    total_diff[:, :-1] += np.abs(pixels[:, :-1] - pixels[:, 1:]).sum(axis=2)
+    neighbor_count[:, :-1] += 1
+    total_diff[:-1, :] += np.abs(pixels[:-1, :] - pixels[1:, :]).sum(axis=2)
+    neighbor_count[:-1, :] += 1
+
+    # 右下角像素没有邻居, total_diff 为 0, 除以 1 后同样得到黑色
+    edge_strength = total_diff // np.maximum(neighbor_count, 1)
+    is_edge = edge_strength > EDGE_THRESHOLD
+
+    return np.where(is_edge, 255, 0).astype(np.uint8)
+
+
+def edge_image_numpy(img: Image.Image) -> Image.Image:
+    new_data = edge_mask_numpy(np.asarray(img))
+    return Image.fromarray(np.repeat(new_data[:, :, None], 3, axis=2), "RGB")
+
+
+EDGE_BACKENDS = {
+    "python": edge_image_python,
+    "numpy": edge_image_numpy,
+}
+
+
+def process_single_image(orig_path: Path, backend: str = EDGE_BACKEND) -> Path:
+    save_path = PROCESSED_DIR / orig_path.name
+
+    with Image.open(orig_path) as img:
+        edge_img = EDGE_BACKENDS[backend](img)
         edge_img.save(save_path)
 
     print(f"Processed {orig_path} and saved to {save_path}")
     return save_path
 
 
-async def process_images(orig_paths: list[Path]) -> list[Path]:
-    loop = asyncio.get_running_loop()
+async def process_images(
+    orig_paths: list[Path | None | Exception],
+    urls: list | None = None,
+    cache: ResultCache | None = None,
+) -> list[Path]:
+    if cache is None:
+        content_hashes = [None] * len(orig_paths)
+    else:
+        content_hashes = [cache.content_hash(url) for url in urls]
 
     with ProcessPoolExecutor(max_workers=CPU_WORKERS) as executor:
         tasks = [
-            loop.run_in_executor(executor, process_single_image, orig_path)
-            for orig_path in orig_paths
+            process_source(
+                executor,
+                orig_path,
+                PROCESSED_DIR / f"image_{img_num}.jpg",
+                content_hash,
+                cache,
+                url,
+            )
+            for img_num, (orig_path, content_hash, url) in enumerate(
+                zip(orig_paths, content_hashes, urls or [None] * len(orig_paths)), start=1
+            )
+            if not isinstance(orig_path, Exception)
         ]
 
         processed_paths = await asyncio.gather(*tasks)
@@ -133,34 +371,507 @@ async def process_images(orig_paths: list[Path]) -> list[Path]:
     return processed_paths
 
 
-async def main():
-    ORIGINAL_DIR.mkdir(parents=True, exist_ok=True)
-    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+class SharedFrame(NamedTuple):
+    """共享内存块的描述: 传给子进程的只有这三个字段, 数据本身不经过 pickle"""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+def create_shared_frame(
+    shape: tuple[int, ...], dtype: str = "uint8"
+) -> tuple[SharedMemory, SharedFrame]:
+    nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    shm = SharedMemory(create=True, size=nbytes)
+    return shm, SharedFrame(shm.name, tuple(shape), dtype)
+
+
+def shared_array(shm: SharedMemory, frame: SharedFrame) -> np.ndarray:
+    return np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)
 
+
+def release_shared(*blocks: SharedMemory):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+async def download_to_shared_memory(
+    client: httpx.AsyncClient,
+    url: str,
+    semaphore: asyncio.Semaphore | AdaptiveLimiter,
+    cache: ResultCache | None = None,
+) -> tuple[SharedMemory, SharedFrame] | None:
+    """下载 JPEG 原始字节, 直接写进共享内存块 (不落盘); 返回 None 表示服务器回复 304
+
+    重试时已写入共享内存的部分保留, 用 Range 请求继续下载剩余字节。
+    """
+    shm = None
+    jpeg = None
+    offset = 0
+    etag = None
+    last_modified = None
+
+    async def attempt() -> tuple[SharedMemory, SharedFrame] | None:
+        nonlocal shm, jpeg, offset, etag, last_modified
+        async with semaphore:
+            print(f"Downloading {url}...")
+            request_url, headers = build_request(url, cache, offset, etag)
+
+            async with client.stream(
+                "GET", request_url, headers=headers, timeout=10, follow_redirects=True
+            ) as response:
+                if await not_modified(response, url, cache):
+                    return None
+                response.raise_for_status()
+                etag = response.headers.get("ETag", etag)
+                last_modified = response.headers.get("Last-Modified", last_modified)
+
+                if response.status_code == 206:
+                    print(f"Resuming {url} from byte {offset}")
+                else:
+                    # 从头下载: 按新的大小重新分配共享内存
+                    if shm is not None:
+                        release_shared(shm)
+                        shm = None
+                    offset = 0
+
+                    content_length = response.headers.get("Content-Length")
+                    if content_length is None:
+                        body = await response.aread()
+                        shm, jpeg = create_shared_frame((len(body),))
+                        shm.buf[: len(body)] = body
+                        offset = len(body)
+                        return shm, jpeg
+                    shm, jpeg = create_shared_frame((int(content_length),))
+
+                # 已知大小: 分块直接写进共享内存, 没有中间缓冲
+                async for chunk in response.aiter_bytes(chunk_size=8192):
+                    shm.buf[offset : offset + len(chunk)] = chunk
+                    offset += len(chunk)
+
+        return shm, jpeg
+
+    try:
+        result = await with_retries(url, attempt)
+    except BaseException:
+        if shm is not None:
+            release_shared(shm)
+        if cache is not None:
+            cache.unpin(url)  # 所有重试都失败 (包括没收到响应的情况)
+        raise
+
+    if result is not None:
+        if cache is not None:
+            cache.remember(
+                url,
+                hashlib.sha256(shm.buf[: jpeg.shape[0]]).hexdigest(),
+                etag,
+                last_modified,
+            )
+        print(f"Downloaded {jpeg.shape[0]} bytes into shared memory: {jpeg.name}")
+
+    return result
+
+
+def open_source_image(
+    source: SharedFrame | Path, shm: SharedMemory | None
+) -> Image.Image:
+    if isinstance(source, Path):
+        return Image.open(source)
+    return Image.open(io.BytesIO(shm.buf[: source.shape[0]]))
+
+
+def decode_shared_image(source: SharedFrame | Path, frame: SharedFrame):
+    """子进程: 把 JPEG (共享内存中的字节或磁盘文件) 解码到共享内存帧"""
+    source_shm = None if isinstance(source, Path) else SharedMemory(name=source.name)
+    frame_shm = SharedMemory(name=frame.name)
+    try:
+        with open_source_image(source, source_shm) as img:
+            shared_array(frame_shm, frame)[...] = np.asarray(img.convert("RGB"))
+    finally:
+        if source_shm is not None:
+            source_shm.close()
+        frame_shm.close()
+
+
+def edge_shared_image(
+    frame: SharedFrame,
+    edges: SharedFrame,
+    row_start: int = 0,
+    row_stop: int | None = None,
+):
+    """子进程: 读取共享内存帧的 [row_start, row_stop) 行, 把边缘结果写进另一个共享内存块"""
+    if row_stop is None:
+        row_stop = frame.shape[0]
+
+    frame_shm = SharedMemory(name=frame.name)
+    edges_shm = SharedMemory(name=edges.name)
+    try:
+        # 多读一行 (与下一条带重叠一行), 条带最后一行才有正确的下方邻居
+        # 不把数组视图保存到变量里: 还有视图引用共享内存时 close() 会报 BufferError
+        shared_array(edges_shm, edges)[row_start:row_stop] = edge_mask_numpy(
+            shared_array(frame_shm, frame)[row_start : row_stop + 1]
+        )[: row_stop - row_start]
+    finally:
+        frame_shm.close()
+        edges_shm.close()
+
+
+def save_shared_image(edges: SharedFrame, save_path: Path) -> Path:
+    edges_shm = SharedMemory(name=edges.name)
+    try:
+        edge_img = Image.fromarray(shared_array(edges_shm, edges), "L").convert("RGB")
+        edge_img.save(save_path)
+    finally:
+        edges_shm.close()
+
+    print(f"Processed {edges.name} and saved to {save_path}")
+    return save_path
+
+
+def strip_bounds(height: int, strips: int) -> list[tuple[int, int]]:
+    """把 height 行切成最多 strips 条水平条带, 返回每条的 [start, stop)"""
+    step = -(-height // max(1, min(strips, height)))
+    return [(start, min(start + step, height)) for start in range(0, height, step)]
+
+
+async def process_shared_image(
+    executor: ProcessPoolExecutor,
+    source: SharedFrame | Path,
+    save_path: Path,
+    strips: int = 1,
+) -> Path:
+    """解码 -> 边缘检测 -> 保存, 三个阶段之间只通过共享内存交换数据
+
+    strips > 1 时边缘检测按水平条带拆成多个任务并行执行, 各条带直接写入同一个结果块,
+    不需要额外拼接, 结果与不分块完全一致。
+    """
+    loop = asyncio.get_running_loop()
+
+    # 只读取 JPEG 头部拿到尺寸, 不做解码
+    source_shm = None if isinstance(source, Path) else SharedMemory(name=source.name)
+    try:
+        with open_source_image(source, source_shm) as img:
+            width, height = img.size
+    finally:
+        if source_shm is not None:
+            source_shm.close()
+
+    frame_shm, frame = create_shared_frame((height, width, 3))
+    edges_shm, edges = create_shared_frame((height, width))
+    try:
+        await loop.run_in_executor(executor, decode_shared_image, source, frame)
+        await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    executor, edge_shared_image, frame, edges, row_start, row_stop
+                )
+                for row_start, row_stop in strip_bounds(height, strips)
+            ]
+        )
+        return await loop.run_in_executor(
+            executor, save_shared_image, edges, save_path
+        )
+    finally:
+        release_shared(frame_shm, edges_shm)
+
+
+async def process_source(
+    executor: ProcessPoolExecutor,
+    source: Path | tuple[SharedMemory, SharedFrame] | None,
+    save_path: Path,
+    content_hash: str | None = None,
+    cache: ResultCache | None = None,
+    url: str | None = None,
+) -> Path:
+    """处理一张图片: 先查结果缓存, 未命中再按配置选择 普通 / 共享内存 / 分条带 处理"""
+    if cache is not None and cache.restore(content_hash, save_path, url):
+        print(f"Cache hit: {content_hash[:12]} -> {save_path}")
+        return save_path
+    if source is None:
+        raise RuntimeError(f"{save_path.name}: got 304 but the cached result is gone")
+
+    if isinstance(source, tuple):
+        save_path = await process_shared_image(
+            executor, source[1], save_path, TILE_STRIPS
+        )
+    elif TILE_STRIPS > 1:
+        save_path = await process_shared_image(executor, source, save_path, TILE_STRIPS)
+    else:
+        loop = asyncio.get_running_loop()
+        save_path = await loop.run_in_executor(executor, process_single_image, source)
+
+    if cache is not None:
+        cache.store(content_hash, save_path)
+    return save_path
+
+
+async def pipeline_images(
+    urls: list,
+    stage_times: dict[str, list[tuple[float, float]]] | None = None,
+    cache: ResultCache | None = None,
+    dl_semaphore: asyncio.Semaphore | AdaptiveLimiter | None = None,
+    failures: list[tuple[str, Exception]] | None = None,
+    client: httpx.AsyncClient | None = None,
+    write_budget: MemoryBudget | None = None,
+) -> AsyncIterator[Path]:
+    """下载与处理流水线: 每张图片下载完成后立刻进入有界队列, 由进程池处理, 处理完一张 yield 一张
+
+    传入 failures 列表时, 单张图片失败只追加 (url, 异常) 到列表里, 其余图片继续处理;
+    否则第一个失败会直接抛给调用者。
+    """
+    if stage_times is None:
+        stage_times = {}
+    stage_times.setdefault("download", [])
+    stage_times.setdefault("process", [])
+
+    if dl_semaphore is None:
+        dl_semaphore = make_download_limiter()
+    if write_budget is None:
+        write_budget = MemoryBudget(WRITE_MEMORY_LIMIT)
+    proc_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    done_queue: asyncio.Queue[Path | tuple[str, Exception]] = asyncio.Queue()
+
+    def discard(source):
+        # 没来得及处理的共享内存块需要手动释放
+        if isinstance(source, tuple):
+            release_shared(source[0])
+
+    # 出错时把 (url, 异常) 放进 done_queue, 由消费者决定记录还是抛出
+    async def download_stage(client: httpx.AsyncClient, url: str, img_num: int):
+        try:
+            start = time.perf_counter()
+            if USE_SHARED_MEMORY:
+                source = await download_to_shared_memory(
+                    client, url, dl_semaphore, cache
+                )
+            else:
+                source = await download_single_image(
+                    client, url, img_num, dl_semaphore, cache, write_budget
+                )
+            stage_times["download"].append((start, time.perf_counter()))
+        except Exception as e:
+            await done_queue.put((url, e))
+            return
+        try:
+            await proc_queue.put((img_num, url, source))  # 队列满时在这里等待 (背压)
+        except asyncio.CancelledError:
+            discard(source)
+            raise
+
+    async def process_stage(executor: ProcessPoolExecutor):
+        while True:
+            img_num, url, source = await proc_queue.get()
+            try:
+                start = time.perf_counter()
+                save_path = await process_source(
+                    executor,
+                    source,
+                    PROCESSED_DIR / f"image_{img_num}.jpg",
+                    cache.content_hash(url) if cache is not None else None,
+                    cache,
+                    url,
+                )
+                stage_times["process"].append((start, time.perf_counter()))
+            except Exception as e:
+                await done_queue.put((url, e))
+            else:
+                await done_queue.put(save_path)
+            finally:
+                discard(source)
+
+    with ProcessPoolExecutor(max_workers=CPU_WORKERS) as executor:
+        async with shared_client(client) as client:
+            tasks = [
+                asyncio.create_task(download_stage(client, url, img_num))
+                for img_num, url in enumerate(urls, start=1)
+            ]
+            tasks += [
+                asyncio.create_task(process_stage(executor))
+                for _ in range(CPU_WORKERS)
+            ]
+
+            # 这里不用 TaskGroup: 调用者可能提前结束 async for, 需要自己取消剩余任务
+            try:
+                for _ in urls:
+                    result = await done_queue.get()
+                    if isinstance(result, tuple):
+                        url, e = result
+                        if failures is None:
+                            raise e
+                        print(f"Failed: {url} ({e!r})")
+                        failures.append(result)
+                        continue
+                    yield result
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                while not proc_queue.empty():
+                    discard(proc_queue.get_nowait()[2])
+
+
+def stage_overlap(stage_times: dict[str, list[tuple[float, float]]]) -> float:
+    """下载阶段与处理阶段在时间上重叠的秒数"""
+    if not stage_times["download"] or not stage_times["process"]:
+        return 0.0
+
+    dl_start = min(start for start, _ in stage_times["download"])
+    dl_end = max(end for _, end in stage_times["download"])
+    proc_start = min(start for start, _ in stage_times["process"])
+    proc_end = max(end for _, end in stage_times["process"])
+
+    return max(0.0, min(dl_end, proc_end) - max(dl_start, proc_start))
+
+
+def print_failures(failures: list[tuple[str, Exception]] | None):
+    if not failures:
+        return
+    print(f"Failed {len(failures)} images:")
+    for url, e in failures:
+        print(f"  {url}: {e!r}")
+
+
+async def run_batched(
+    urls: list,
+    cache: ResultCache | None = None,
+    client: httpx.AsyncClient | None = None,
+):
     start_time = time.perf_counter()
+    dl_semaphore = make_download_limiter()
+    write_budget = MemoryBudget(WRITE_MEMORY_LIMIT)
 
-    img_paths = await download_images(IMAGE_URLS)
+    img_paths = await download_images(
+        urls, cache, dl_semaphore, client, write_budget
+    )
 
     proc_start_time = time.perf_counter()
 
-    processed_paths = await process_images(img_paths)
+    processed_paths = await process_images(img_paths, urls, cache)
 
     finished_time = time.perf_counter()
 
+    failures = [
+        (url, e) for url, e in zip(urls, img_paths) if isinstance(e, Exception)
+    ]
+
     dl_total_time = proc_start_time - start_time
     proc_total_time = finished_time - proc_start_time
     total_time = finished_time - start_time
 
     print(
-        f"\nDownloaded {len(img_paths)} images in: {dl_total_time:.2f} seconds. {(dl_total_time / total_time) * 100:.2f}% of total time",
+        f"\nDownloaded {len(img_paths) - len(failures)} images in: {dl_total_time:.2f} seconds. {(dl_total_time / total_time) * 100:.2f}% of total time",
     )
     print(
         f"Processed {len(processed_paths)} images in: {proc_total_time:.2f} seconds. {(proc_total_time / total_time) * 100:.2f}% of total time",
     )
+    print_failures(failures)
+    if isinstance(dl_semaphore, AdaptiveLimiter):
+        print(f"Download limiter: {dl_semaphore.summary()}")
+    if WRITE_BEHIND and not USE_SHARED_MEMORY:
+        print(f"Write buffers: {write_budget.summary()}")
+    if cache is not None:
+        print(f"Result cache: {cache.summary()}")
     print(
         f"\nTotal execution time: {total_time:.2f} seconds. {(total_time / total_time) * 100:.2f}% of total time",
     )
 
 
+async def run_pipelined(
+    urls: list,
+    cache: ResultCache | None = None,
+    client: httpx.AsyncClient | None = None,
+):
+    start_time = time.perf_counter()
+    stage_times: dict[str, list[tuple[float, float]]] = {}
+    dl_semaphore = make_download_limiter()
+    write_budget = MemoryBudget(WRITE_MEMORY_LIMIT)
+    failures = [] if COLLECT_FAILURES else None
+
+    processed_paths = []
+    async for save_path in pipeline_images(
+        urls, stage_times, cache, dl_semaphore, failures, client, write_budget
+    ):
+        processed_paths.append(save_path)
+        print(
+            f"[{time.perf_counter() - start_time:.2f}s] Ready: {save_path} ({len(processed_paths)}/{len(urls)})"
+        )
+
+    finished_time = time.perf_counter()
+    total_time = finished_time - start_time
+
+    dl_total_time = (
+        max((end for _, end in stage_times["download"]), default=start_time)
+        - start_time
+    )
+    proc_start_time = min(
+        (start for start, _ in stage_times["process"]), default=finished_time
+    )
+    proc_total_time = finished_time - proc_start_time
+    overlap_time = stage_overlap(stage_times)
+
+    print(
+        f"\nDownloaded {len(stage_times['download'])} images in: {dl_total_time:.2f} seconds. {(dl_total_time / total_time) * 100:.2f}% of total time",
+    )
+    print(
+        f"Processed {len(processed_paths)} images in: {proc_total_time:.2f} seconds (first started at {proc_start_time - start_time:.2f}s). {(proc_total_time / total_time) * 100:.2f}% of total time",
+    )
+    print(
+        f"Download/process overlap: {overlap_time:.2f} seconds. {(overlap_time / total_time) * 100:.2f}% of total time",
+    )
+    print_failures(failures)
+    if isinstance(dl_semaphore, AdaptiveLimiter):
+        print(f"Download limiter: {dl_semaphore.summary()}")
+    if WRITE_BEHIND and not USE_SHARED_MEMORY:
+        print(f"Write buffers: {write_budget.summary()}")
+    if cache is not None:
+        print(f"Result cache: {cache.summary()}")
+    print(
+        f"\nTotal execution time: {total_time:.2f} seconds. {(total_time / total_time) * 100:.2f}% of total time",
+    )
+
+
+async def run(
+    urls: list,
+    cache: ResultCache | None = None,
+    client: httpx.AsyncClient | None = None,
+):
+    if PIPELINE:
+        await run_pipelined(urls, cache, client)
+    else:
+        await run_batched(urls, cache, client)
+
+
+async def run_all(urls: list, cache: ResultCache | None = None):
+    stats = ConnectionStats()
+    async with make_client(HTTP_POOL, stats) as client:
+        for run_num in range(1, RUNS + 1):
+            if RUNS > 1:
+                print(f"\n===== Run {run_num}/{RUNS} =====")
+            await run(urls, cache, client)
+            print(f"Connections: {stats.summary()}")
+
+
+async def main():
+    ORIGINAL_DIR.mkdir(parents=True, exist_ok=True)
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+
+    cache = None
+    if USE_RESULT_CACHE:
+        cache = ResultCache(CACHE_DIR, RESULT_VERSION, CACHE_MAX_BYTES)
+
+    try:
+        if USE_FIXTURE_SERVER:
+            with FixtureServer(image_count=len(IMAGE_URLS)) as server:
+                await run_all(server.urls, cache)
+        else:
+            await run_all(IMAGE_URLS, cache)
+    finally:
+        if cache is not None:
+            cache.save()
+
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,144 @@
+"""
+按内容寻址的处理结果缓存 (磁盘)。
+
+- 结果文件以 "下载内容的 sha256 + 算法版本" 为键, 图片内容不变就不必重新做边缘检测
+- 记录每个 URL 的 ETag / Last-Modified, 下载时可以发条件请求, 服务器返回 304 就不用重新下载
+- 总大小超过 max_bytes 时按最近最少使用 (LRU) 淘汰
+"""
+
+import json
+import shutil
+import time
+from pathlib import Path
+
+
+class ResultCache:
+    def __init__(self, root: Path, version: str, max_bytes: int = 256 * 1024 * 1024):
+        self.root = Path(root)
+        self.version = version
+        self.max_bytes = max_bytes
+        self.results_dir = self.root / "results"
+        self.index_path = self.root / "index.json"
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        # 已经发出条件请求的结果 (url -> 结果键): 服务器回 304 后还要用到, 在取出之前不能被淘汰;
+        # 按 url 记录, 内容相同的两个 url 共用一个结果时, 一个取完不会解除另一个的固定
+        self.pinned: dict[str, str] = {}
+
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        if self.index_path.exists():
+            index = json.loads(self.index_path.read_text())
+        else:
+            index = {}
+        self.urls: dict[str, dict] = index.get("urls", {})
+        self.entries: dict[str, dict] = index.get("entries", {})
+
+    def key(self, content_hash: str) -> str:
+        return f"{content_hash}-{self.version}"
+
+    def result_path(self, content_hash: str) -> Path:
+        return self.results_dir / f"{self.key(content_hash)}.jpg"
+
+    def has_result(self, content_hash: str) -> bool:
+        return (
+            self.key(content_hash) in self.entries
+            and self.result_path(content_hash).exists()
+        )
+
+    def touch(self, content_hash: str):
+        self.entries[self.key(content_hash)]["last_used"] = time.time()
+
+    # ---------- 下载侧: 条件请求 ----------
+
+    def content_hash(self, url: str) -> str | None:
+        info = self.urls.get(url)
+        return info["content_hash"] if info else None
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        """只有结果还在缓存里时才发条件请求, 否则 304 之后没有东西可用"""
+        info = self.urls.get(url)
+        if info is None or not self.has_result(info["content_hash"]):
+            return {}
+
+        self.touch(info["content_hash"])
+        self.pinned[url] = self.key(info["content_hash"])
+
+        headers = {}
+        if info.get("etag"):
+            headers["If-None-Match"] = info["etag"]
+        if info.get("last_modified"):
+            headers["If-Modified-Since"] = info["last_modified"]
+        return headers
+
+    def unpin(self, url: str):
+        """条件请求没有得到 304 (200 / 出错) 时调用: 旧结果不会被取用, 可以正常淘汰"""
+        self.pinned.pop(url, None)
+
+    def remember(
+        self,
+        url: str,
+        content_hash: str,
+        etag: str | None,
+        last_modified: str | None,
+    ):
+        self.urls[url] = {
+            "content_hash": content_hash,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+
+    # ---------- 处理侧: 结果读写 ----------
+
+    def restore(self, content_hash: str, save_path: Path, url: str | None = None) -> bool:
+        """命中时把缓存的结果复制到 save_path; 之后解除 url 的条件请求对结果的固定"""
+        try:
+            if not self.has_result(content_hash):
+                self.misses += 1
+                return False
+
+            shutil.copyfile(self.result_path(content_hash), save_path)
+            self.touch(content_hash)
+            self.hits += 1
+            return True
+        finally:
+            if url is not None:
+                self.unpin(url)
+
+    def store(self, content_hash: str, result_path: Path):
+        cached_path = self.result_path(content_hash)
+        shutil.copyfile(result_path, cached_path)
+        self.entries[self.key(content_hash)] = {
+            "size": cached_path.stat().st_size,
+            "last_used": time.time(),
+        }
+        self.evict()
+
+    def evict(self):
+        total = sum(entry["size"] for entry in self.entries.values())
+        # 按 last_used 从旧到新淘汰
+        by_last_used = sorted(self.entries.items(), key=lambda kv: kv[1]["last_used"])
+        pinned = set(self.pinned.values())
+        for key, entry in by_last_used:
+            if total <= self.max_bytes:
+                break
+            if key in pinned:
+                continue
+            (self.results_dir / f"{key}.jpg").unlink(missing_ok=True)
+            del self.entries[key]
+            total -= entry["size"]
+            self.evictions += 1
+
+    def save(self):
+        index = {"urls": self.urls, "entries": self.entries}
+        self.index_path.write_text(json.dumps(index, indent=2))
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0.0
+        return (
+            f"hits={self.hits}, misses={self.misses} ({hit_rate:.2f}% hit rate), "
+            f"not modified (304)={self.not_modified}, evictions={self.evictions}"
+        )
@@ -0,0 +1,110 @@
+"""
+合并小块写入 + 后台写盘 (write-behind), 并限制所有下载加起来占用的缓冲内存。
+
+aiofiles 每写一次都要往线程池派一个任务, 8 KiB 一块时一张 2 MB 的图片就是 250 次往返。
+这里先把网络收到的数据攒进内存缓冲区, 攒够 buffer_size 再交给线程一次写出;
+写盘的同时继续接收下一段数据。缓冲区里的字节都要先从 MemoryBudget 申请,
+几百个下载同时进行时内存占用也不会超过 limit。
+"""
+
+import asyncio
+from pathlib import Path
+
+
+class MemoryBudget:
+    """所有下载共享的缓冲内存上限 (字节); 数据写盘之后才归还
+
+    单块比整个上限还大时不能一直等下去: 等到没有其他缓冲的数据时单独放行 (这时 peak 会超过 limit)。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.waits = 0  # 因为额度不够而等待的次数
+        self._condition = asyncio.Condition()
+
+    def try_acquire(self, size: int) -> bool:
+        if self.used + size > self.limit and self.used > 0:
+            return False
+        self.used += size
+        self.peak = max(self.peak, self.used)
+        return True
+
+    async def acquire(self, size: int):
+        async with self._condition:
+            if self.try_acquire(size):
+                return
+            self.waits += 1
+            await self._condition.wait_for(lambda: self.try_acquire(size))
+
+    async def release(self, size: int):
+        async with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+    def summary(self) -> str:
+        return (
+            f"peak buffered={self.peak / 1024 / 1024:.2f} MB "
+            f"(limit {self.limit / 1024 / 1024:.2f} MB), waits={self.waits}"
+        )
+
+
+class WriteBehindFile:
+    """async with WriteBehindFile(path, "wb", budget) as f: await f.write(chunk)
+
+    同一个文件最多只有一个缓冲区在写盘, 保证写入顺序; 出错退出时也会把已收到的数据写完,
+    这样断点续传可以从真正收到的位置继续。
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        mode: str,
+        budget: MemoryBudget,
+        buffer_size: int = 1024 * 1024,
+    ):
+        self.path = path
+        self.mode = mode
+        self.budget = budget
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.file = None
+        self.pending: asyncio.Task | None = None
+        self.flushes = 0
+
+    async def __aenter__(self) -> "WriteBehindFile":
+        self.file = await asyncio.to_thread(open, self.path, self.mode)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self.flush()
+            if self.pending is not None:
+                await self.pending
+        finally:
+            await asyncio.to_thread(self.file.close)
+
+    async def write(self, chunk: bytes):
+        if not self.budget.try_acquire(len(chunk)):
+            # 额度不够时先把自己手里的缓冲区写出去, 否则所有下载可能互相等待对方释放
+            await self.flush()
+            await self.budget.acquire(len(chunk))
+        self.buffer += chunk
+        if len(self.buffer) >= self.buffer_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        if self.pending is not None:
+            await self.pending  # 上一个缓冲区还没写完, 等它写完再写下一个
+        data, self.buffer = self.buffer, bytearray()
+        self.pending = asyncio.create_task(self._write(data))
+        self.flushes += 1
+
+    async def _write(self, data: bytearray):
+        try:
+            await asyncio.to_thread(self.file.write, data)
+        finally:
+            await self.budget.release(len(data))
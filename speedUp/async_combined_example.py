@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio + 缓存 订单处理示例
+==========================
+
+combined_example.py 里所有慢操作都是 I/O 等待 (time.sleep), 用线程池只能同时处理 max_workers 个订单。
+这里把 DataService 和 process_single_order 改成 async 版本:
+- 一个事件循环里可以同时挂起成千上万个订单, 等待时不占线程
+- ttl_lru_cache 装饰 async def 时缓存 await 之后的结果, 并发未命中同一个键的协程只查询一次
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from combined_example import (
+    DEFAULT_DISCOUNT,
+    DISCOUNT_RULES,
+    PRODUCT_CACHE_TTL,
+    USER_CACHE_TTL,
+    DataService,
+    demo_parallel_processing,
+    demo_serial_processing,
+    price_order,
+)
+from ttl_cache import ttl_lru_cache
+
+ASYNC_WORKERS = 1000  # 限制并发时同时处理的订单数
+
+
+class AsyncDataService:
+    """DataService 的 async 版本 - 数据与 DataService 相同, 查询延迟用 asyncio.sleep 模拟"""
+
+    def __init__(self, source: Optional[DataService] = None):
+        source = source or DataService()
+        self.users_db = source.users_db
+        self.products_db = source.products_db
+
+    @ttl_lru_cache(maxsize=128, ttl=USER_CACHE_TTL)
+    async def get_user_info(self, user_id: int) -> Dict[str, Any]:
+        """获取用户信息 - 使用缓存优化"""
+        print(f"    查询用户数据库: user_id={user_id}")
+        await asyncio.sleep(0.05)  # 模拟数据库查询延迟
+        return self.users_db.get(user_id, {"error": "用户不存在"})
+
+    @ttl_lru_cache(maxsize=64, ttl=PRODUCT_CACHE_TTL)
+    async def get_product_info(self, product_id: int) -> Dict[str, Any]:
+        """获取商品信息 - 使用缓存优化"""
+        print(f"    查询商品数据库: product_id={product_id}")
+        await asyncio.sleep(0.03)  # 模拟数据库查询延迟
+        return self.products_db.get(product_id, {"error": "商品不存在"})
+
+    @ttl_lru_cache(maxsize=32)
+    async def calculate_discount(self, user_level: str, product_category: str) -> float:
+        """计算折扣 - 使用缓存优化复杂计算"""
+        print(f"    计算折扣: {user_level} + {product_category}")
+        await asyncio.sleep(0.02)  # 模拟复杂计算
+        return DISCOUNT_RULES.get((user_level, product_category), DEFAULT_DISCOUNT)
+
+
+async def process_single_order_async(service: AsyncDataService, order: Dict[str, Any]) -> Dict[str, Any]:
+    """处理单个订单 (async 版本)"""
+    order_id = order["order_id"]
+
+    try:
+        # 依次 await: 命中缓存时协程不会挂起, 比 gather 少创建两个 Task (10 万个订单时差别明显)
+        user_info = await service.get_user_info(order["user_id"])
+        if "error" in user_info:
+            return {"order_id": order_id, "status": "失败", "error": "用户不存在"}
+
+        product_info = await service.get_product_info(order["product_id"])
+        if "error" in product_info:
+            return {"order_id": order_id, "status": "失败", "error": "商品不存在"}
+
+        discount = await service.calculate_discount(user_info["level"], product_info["category"])
+
+        # 模拟订单处理时间
+        await asyncio.sleep(0.01)
+
+        return price_order(order, user_info, product_info, discount)
+
+    except Exception as e:
+        return {
+            "order_id": order_id,
+            "status": "失败",
+            "error": str(e)
+        }
+
+
+async def process_orders_async(service: AsyncDataService, orders: List[Dict[str, Any]],
+                               max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+    """在一个事件循环里处理所有订单
+
+    max_concurrency=None: 每个订单一个 Task, 全部同时挂起
+    max_concurrency=N: 只启动 N 个 worker 协程, 轮流从同一个迭代器里取订单;
+    不用 Semaphore 包住 10 万个 Task, 内存和调度开销都只与 N 有关
+    """
+    if max_concurrency is None:
+        return await asyncio.gather(*(process_single_order_async(service, order) for order in orders))
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(orders)
+    pending = iter(enumerate(orders))  # 单线程事件循环里多个协程共享迭代器是安全的
+
+    async def worker():
+        for i, order in pending:
+            results[i] = await process_single_order_async(service, order)
+
+    await asyncio.gather(*(worker() for _ in range(min(max_concurrency, len(orders)))))
+    return results
+
+
+def make_orders(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "order_id": f"ORD_{i:06d}",
+            "user_id": random.randint(1, 20),
+            "product_id": random.randint(1, 10),
+            "quantity": random.randint(1, 3)
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+async def demo_async_processing(count: int, max_concurrency: Optional[int] = None) -> float:
+    """async 处理演示, 返回耗时"""
+    mode = "全部同时挂起" if max_concurrency is None else f"{max_concurrency} 个 worker 协程"
+    print(f"\n\n=== async 处理 {count} 个订单 (单线程, 一个事件循环, {mode}) ===")
+
+    service = AsyncDataService()
+    orders = make_orders(count)
+
+    start = time.time()
+    results = await process_orders_async(service, orders, max_concurrency)
+    async_time = time.time() - start
+    successful = len([r for r in results if r["status"] == "成功"])
+
+    print(f"\nasync 处理结果:")
+    print(f"  成功: {successful}/{len(orders)} 个")
+    print(f"  耗时: {async_time:.2f}秒 ({count / async_time:.0f} 订单/秒)")
+    print(f"  用户查询缓存: {service.get_user_info.cache_info()}")
+    print(f"  商品查询缓存: {service.get_product_info.cache_info()}")
+    print(f"  折扣计算缓存: {service.calculate_discount.cache_info()}")
+    coalesced = {
+        "用户": service.get_user_info.cache_stats()["coalesced"],
+        "商品": service.get_product_info.cache_stats()["coalesced"],
+        "折扣": service.calculate_discount.cache_stats()["coalesced"],
+    }
+    print(f"  并发未命中合并 (省掉的重复查询): {coalesced}")
+
+    return async_time
+
+
+def main():
+    """主函数"""
+    print("⚡ asyncio + 缓存 订单处理示例")
+    print("="*60)
+
+    # demo_serial_processing / demo_parallel_processing 各处理 20 个订单
+    serial_time = demo_serial_processing()
+    parallel_time = demo_parallel_processing()
+    async_small_time = asyncio.run(demo_async_processing(20))
+    async_large_time = asyncio.run(demo_async_processing(100_000))
+    async_workers_time = asyncio.run(demo_async_processing(100_000, ASYNC_WORKERS))
+
+    print("\n" + "="*60)
+    print("📊 吞吐量对比:")
+    print(f"  串行 (20 个订单):          {20 / serial_time:>10.0f} 订单/秒  耗时 {serial_time:.2f}秒")
+    print(f"  线程池 4 线程 (20 个订单):  {20 / parallel_time:>10.0f} 订单/秒  耗时 {parallel_time:.2f}秒")
+    print(f"  async (20 个订单):         {20 / async_small_time:>10.0f} 订单/秒  耗时 {async_small_time:.2f}秒")
+    print(f"  async (100000 个订单):     {100_000 / async_large_time:>10.0f} 订单/秒  耗时 {async_large_time:.2f}秒")
+    print(f"  async {ASYNC_WORKERS} worker (100000 个订单): {100_000 / async_workers_time:>6.0f} 订单/秒  耗时 {async_workers_time:.2f}秒")
+
+    print("\n💡 关键收益:")
+    print("1. 等待 I/O 时不占线程, 并发数不再受 max_workers 限制")
+    print("2. 命中缓存的 await 不会挂起, 每个订单只有一个 Task 的开销")
+    print("3. 缓存 await 后的结果, 并发未命中同一个键时只查询一次")
+    print("4. 订单非常多时限制并发 (worker 协程), 避免同时存在十万个 Task 带来的调度和 GC 开销")
+
+
+if __name__ == "__main__":
+    main()
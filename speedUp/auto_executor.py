@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+自动选择线程 / 进程 / asyncio 的执行器
+====================================
+
+threadpool_tutorial.py、processpool_tutorial.py 和 asyncio/tutorial_2.py 要求使用者自己判断任务类型:
+等 I/O 用线程池 (等待时释放 GIL), 纯 Python 计算用进程池 (绕开 GIL), 协程用事件循环。
+
+AutoExecutor 对每个函数的前 probe_calls 次调用做测量 (一次只跑一个, 互不干扰):
+- 墙上时间 (time.perf_counter) 与这个线程实际占用的 CPU 时间 (time.thread_time)
+- GIL 占用: thread_time 不区分计算时是否持有 GIL (numpy、hashlib 计算时会释放 GIL),
+  所以测量期间另开一个线程反复 sleep(1ms), 醒来后拿不到 GIL 而多等的时间占墙上时间的比例就是 GIL 占用率
+- CPU 占比 < cpu_threshold: 大部分时间在阻塞等待, 交给线程池
+- CPU 占比高、但 GIL 占用率 < cpu_threshold: 计算时释放了 GIL, 线程之间就能并行, 交给线程池
+- CPU 占比和 GIL 占用率都高: 纯 Python 计算, 交给进程池 (函数能 pickle、且不止一个 CPU 时)
+- async def 函数直接交给后台线程里的事件循环, 不需要测量
+测量期间提交的调用先排队, 决定好后端后一起派发。report() 给出每个函数的决定、依据和实测加速比
+(加速比 = 调用次数 x 单次串行耗时 / 从第一次派发到最后一次完成的时间)。
+shutdown(wait=True) (包括 with 语句结束时) 先等测量结束、排队的调用派发出去并执行完, 再关闭各个后端。
+
+    with AutoExecutor() as executor:
+        futures = [executor.submit(cpu_heavy, n) for n in nums]
+        print(executor.report())
+"""
+
+import asyncio
+import concurrent.futures
+import inspect
+import os
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+THREAD = "thread"
+PROCESS = "process"
+ASYNC = "async"
+
+
+def _chain(source: concurrent.futures.Future, target: concurrent.futures.Future):
+    """source 完成后把结果 (或异常) 复制给 target"""
+    def copy(done: concurrent.futures.Future):
+        if done.cancelled():
+            target.cancel()
+        elif done.exception() is not None:
+            target.set_exception(done.exception())
+        else:
+            target.set_result(done.result())
+
+    source.add_done_callback(copy)
+
+
+class _GilMonitor:
+    """有测量在进行时, 后台线程反复 sleep(interval); 醒来后等 GIL 的时间累加到 blocked"""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.blocked = 0.0
+        self._users = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._users == 0:
+                    self._thread = None
+                    return
+            start = time.perf_counter()
+            time.sleep(self.interval)
+            self.blocked += max(0.0, time.perf_counter() - start - self.interval)
+
+    def __enter__(self) -> "_GilMonitor":
+        with self._lock:
+            self._users += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._lock:
+            self._users -= 1
+
+
+class _Profile:
+    """一个函数的测量结果和后端选择"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.backend: Optional[str] = None
+        self.reason = ""
+        self.probes_started = 0
+        self.wall: List[float] = []
+        self.cpu: List[float] = []
+        self.gil: List[float] = []  # 测量期间监控线程等 GIL 的时间
+        self.pending: List[Tuple[concurrent.futures.Future, Tuple, Dict[str, Any]]] = []
+        self.probe_lock = threading.Lock()  # 测量时一次只跑一个调用
+
+        self.calls = 0  # 派发到选定后端的调用次数
+        self.first_dispatch: Optional[float] = None
+        self.last_done: Optional[float] = None
+
+    @property
+    def cpu_ratio(self) -> float:
+        return sum(self.cpu) / sum(self.wall) if sum(self.wall) > 0 else 0.0
+
+    @property
+    def gil_ratio(self) -> float:
+        return sum(self.gil) / sum(self.wall) if sum(self.wall) > 0 else 0.0
+
+    @property
+    def serial_time(self) -> float:
+        """单次调用的串行耗时 (测量的平均墙上时间)"""
+        return sum(self.wall) / len(self.wall) if self.wall else 0.0
+
+    def speedup(self) -> Optional[float]:
+        if not self.calls or self.last_done is None or self.first_dispatch is None:
+            return None
+        elapsed = self.last_done - self.first_dispatch
+        return self.calls * self.serial_time / elapsed if elapsed > 0 else None
+
+
+class AutoExecutor:
+    """submit / map 接口与 concurrent.futures 相同, 后端按函数自动选择"""
+
+    def __init__(
+        self,
+        max_threads: int = 32,
+        max_processes: Optional[int] = None,
+        probe_calls: int = 3,
+        cpu_threshold: float = 0.5,
+    ):
+        if probe_calls < 1:
+            raise ValueError("probe_calls 至少为 1")  # 否则测量永远凑不够次数, 提交的调用一直排队
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self.probe_calls = probe_calls
+        self.cpu_threshold = cpu_threshold
+
+        self._threads = concurrent.futures.ThreadPoolExecutor(max_workers=max_threads)
+        self._processes: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._profiles: Dict[Callable, _Profile] = {}
+        self._lock = threading.Lock()
+        self._gil_monitor = _GilMonitor()
+        self._probes: Set[concurrent.futures.Future] = set()  # 还没结束的测量
+        self._async_futures: Set[concurrent.futures.Future] = set()  # 还没完成的协程
+        self._shutdown = False
+
+    # ---------- 后端 ----------
+
+    def _process_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                self._processes = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_processes)
+            return self._processes
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def _dispatch(self, profile: _Profile, fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> concurrent.futures.Future:
+        if profile.backend == ASYNC:
+            future = asyncio.run_coroutine_threadsafe(self._timed(profile, fn(*args, **kwargs)), self._event_loop())
+            with self._lock:
+                self._async_futures.add(future)
+            future.add_done_callback(self._async_futures.discard)
+        elif profile.backend == PROCESS:
+            future = self._process_pool().submit(fn, *args, **kwargs)
+        else:
+            future = self._threads.submit(fn, *args, **kwargs)
+
+        with self._lock:
+            profile.calls += 1
+            if profile.first_dispatch is None:
+                profile.first_dispatch = time.perf_counter()
+
+        def done(_):
+            profile.last_done = time.perf_counter()
+
+        future.add_done_callback(done)
+        return future
+
+    # ---------- 测量 ----------
+
+    async def _timed(self, profile: _Profile, coro) -> Any:
+        """协程不需要测量就能决定后端, 这里只记录前几次的耗时, 用来计算加速比"""
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            with self._lock:
+                if len(profile.wall) < self.probe_calls:
+                    profile.wall.append(time.perf_counter() - start)
+
+    def _probe(self, profile: _Profile, fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        error: Optional[BaseException] = None
+        result = None
+        with profile.probe_lock, self._gil_monitor as monitor:
+            wall_start, cpu_start, gil_start = time.perf_counter(), time.thread_time(), monitor.blocked
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:  # 出错的调用也算一次测量, 否则排队的调用永远等不到决定
+                error = e
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            gil = monitor.blocked - gil_start
+
+        with self._lock:
+            profile.wall.append(wall)
+            profile.cpu.append(cpu)
+            profile.gil.append(gil)
+            ready = len(profile.wall) == self.probe_calls
+        if ready:
+            self._decide(profile, fn)
+        if error is not None:
+            raise error
+        return result
+
+    def _decide(self, profile: _Profile, fn: Callable):
+        ratio, gil = profile.cpu_ratio, profile.gil_ratio
+        if ratio < self.cpu_threshold:
+            backend, reason = THREAD, f"CPU 占比 {ratio:.0%}, 大部分时间在等待"
+        elif gil < self.cpu_threshold:
+            backend, reason = THREAD, f"CPU 占比 {ratio:.0%}, GIL 占用 {gil:.0%}, 计算时释放 GIL, 线程可以并行"
+        elif self.max_processes < 2:
+            backend, reason = THREAD, f"CPU 占比 {ratio:.0%}, 但只有 1 个 CPU, 多进程没有收益"
+        else:
+            try:
+                pickle.dumps(fn)
+            except Exception:
+                backend, reason = THREAD, f"CPU 占比 {ratio:.0%}, 但函数不能 pickle, 无法交给进程池"
+            else:
+                backend, reason = PROCESS, f"CPU 占比 {ratio:.0%}, GIL 占用 {gil:.0%}, 计算一直持有 GIL"
+
+        with self._lock:
+            profile.backend, profile.reason = backend, reason
+            pending, profile.pending = profile.pending, []
+        for placeholder, args, kwargs in pending:
+            try:
+                _chain(self._dispatch(profile, fn, args, kwargs), placeholder)
+            except RuntimeError as e:  # shutdown(wait=False) 之后后端已经关闭
+                placeholder.set_exception(e)
+
+    # ---------- 接口 ----------
+
+    def submit(self, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("AutoExecutor 已经关闭")
+            profile = self._profiles.get(fn)
+            if profile is None:
+                profile = self._profiles[fn] = _Profile(getattr(fn, "__qualname__", repr(fn)))
+                if inspect.iscoroutinefunction(fn):
+                    profile.backend, profile.reason = ASYNC, "async def, 交给事件循环"
+            backend = profile.backend
+            probe = backend is None and profile.probes_started < self.probe_calls
+            if probe:
+                profile.probes_started += 1
+            elif backend is None:
+                # 测量还没结束: 先排队, 选好后端后再派发
+                placeholder = concurrent.futures.Future()
+                profile.pending.append((placeholder, args, kwargs))
+                return placeholder
+
+        if probe:
+            future = self._threads.submit(self._probe, profile, fn, args, kwargs)
+            with self._lock:
+                self._probes.add(future)
+            future.add_done_callback(self._probes.discard)
+            return future
+        return self._dispatch(profile, fn, args, kwargs)
+
+    def map(self, fn: Callable, *iterables: Iterable) -> Iterator[Any]:
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return (future.result() for future in futures)
+
+    def report(self) -> str:
+        lines = []
+        with self._lock:
+            profiles = list(self._profiles.values())
+        for profile in profiles:
+            speedup = profile.speedup()
+            lines.append(
+                f"{profile.name}: {profile.backend or '测量中'} ({profile.reason}); "
+                f"单次 {profile.serial_time * 1000:.1f}ms, 派发 {profile.calls} 次"
+                + (f", 实测加速 {speedup:.1f}x" if speedup else "")
+            )
+        return "\n".join(lines)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            self._shutdown = True
+            probes = list(self._probes)
+        if wait:
+            # 测量结束时 _decide 会把排队的调用派发出去, 所以要在关闭后端之前等它们
+            concurrent.futures.wait(probes)
+
+        # 仍在排队的调用 (wait=False, 或测量没能完成) 不会再被派发
+        with self._lock:
+            queued = [placeholder for profile in self._profiles.values() for placeholder, _, _ in profile.pending]
+            for profile in self._profiles.values():
+                profile.pending = []
+        for placeholder in queued:
+            placeholder.set_exception(RuntimeError("AutoExecutor 已经关闭, 调用没有被派发"))
+
+        if wait:
+            with self._lock:
+                async_futures = list(self._async_futures)
+            concurrent.futures.wait(async_futures)
+        self._threads.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+
+    def __enter__(self) -> "AutoExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+
+# ---------- 演示 ----------
+
+def io_task(task_id: int) -> str:
+    """模拟数据库查询 / 网络请求"""
+    time.sleep(0.2)
+    return f"任务{task_id}"
+
+
+def cpu_task(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+async def async_task(task_id: int) -> str:
+    await asyncio.sleep(0.2)
+    return f"协程{task_id}"
+
+
+def main():
+    print("⚙️ 自动选择执行后端")
+    print("=" * 60)
+    with AutoExecutor() as executor:
+        start = time.perf_counter()
+        futures = [executor.submit(io_task, i) for i in range(20)]
+        futures += [executor.submit(cpu_task, 1_000_000) for _ in range(12)]
+        futures += [executor.submit(async_task, i) for i in range(100)]
+        for future in futures:
+            future.result()
+        print(f"132 个任务总耗时: {time.perf_counter() - start:.2f}秒\n")
+        print(executor.report())
+
+
+if __name__ == "__main__":
+    main()
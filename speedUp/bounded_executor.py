@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+有界提交: 控制在途任务数的 map / as_completed
+==========================================
+
+threadpool_tutorial.py 里的写法是先把所有任务 submit 进去:
+
+    futures = {executor.submit(task, i): i for i in inputs}
+
+执行器的任务队列没有上限, 一百万个输入就有一百万个 Future 和参数同时留在内存里,
+而且要等全部提交完才开始处理第一个结果。
+
+这里的两个生成器同一时刻最多只有 max_in_flight 个任务已提交还没被取走,
+完成一个再从输入里取一个 (输入可以是生成器, 不会被一次性读完), 内存占用与输入总数无关:
+- bounded_as_completed: 按完成顺序产出 (输入, 已完成的 future), 出错的任务由调用者自己 future.result() 处理
+- bounded_map: 按输入顺序产出结果, 与 executor.map 相同; 出错时在对应位置抛出异常
+生成器中途被关闭 (break / close()) 时, 还没开始执行的任务会被取消。
+
+bounded_map 等队首任务时不再提交新任务, 一个慢任务会让整个窗口停下来。imap 把"并发数"和"乱序缓冲"分开:
+- max_in_flight 个任务同时执行, 已完成但排在慢任务后面的结果放进重排缓冲区
+- 等慢任务时最多再多提交 max_buffer 个任务 (已提交未产出的任务 <= max_in_flight + max_buffer,
+  缓冲区里最多 max_in_flight + max_buffer - 1 个结果), 慢任务完成时后面的结果已经准备好, 一次性按顺序产出
+- imap_unordered: 谁先完成先产出结果, 不需要缓冲
+传入 StreamStats 可以统计队头阻塞: 有结果已经完成、却因为前面的任务没完成而等待的时间。
+"""
+
+import concurrent.futures
+import itertools
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_IN_FLIGHT = 64
+
+
+def bounded_as_completed(
+    executor: concurrent.futures.Executor,
+    fn: Callable[[T], Any],
+    inputs: Iterable[T],
+    max_in_flight: int = DEFAULT_IN_FLIGHT,
+) -> Iterator[Tuple[T, concurrent.futures.Future]]:
+    """按完成顺序产出 (输入, future); 在途任务数不超过 max_in_flight"""
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight 至少为 1")
+    inputs = iter(inputs)
+    pending: Dict[concurrent.futures.Future, T] = {}
+    try:
+        for item in itertools.islice(inputs, max_in_flight):
+            pending[executor.submit(fn, item)] = item
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                # 先补上一个新任务再产出结果, 调用者处理结果时线程池不会闲着
+                for next_item in itertools.islice(inputs, 1):
+                    pending[executor.submit(fn, next_item)] = next_item
+                yield item, future
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def bounded_map(
+    executor: concurrent.futures.Executor,
+    fn: Callable[[T], Any],
+    inputs: Iterable[T],
+    max_in_flight: int = DEFAULT_IN_FLIGHT,
+) -> Iterator[Any]:
+    """按输入顺序产出结果; 等队首任务时, 后面最多已经提交了 max_in_flight - 1 个任务"""
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight 至少为 1")
+    inputs = iter(inputs)
+    window: Deque[concurrent.futures.Future] = deque()
+    try:
+        for item in itertools.islice(inputs, max_in_flight):
+            window.append(executor.submit(fn, item))
+
+        while window:
+            result = window.popleft().result()
+            for next_item in itertools.islice(inputs, 1):
+                window.append(executor.submit(fn, next_item))
+            yield result
+    finally:
+        for future in window:
+            future.cancel()
+
+
+class StreamStats:
+    """imap / imap_unordered 的统计, 生成器运行过程中持续更新"""
+
+    def __init__(self):
+        self.results = 0
+        self.max_buffered = 0  # 同时最多有几个已完成的结果排在未完成的任务后面
+        self.head_of_line_seconds = 0.0  # 缓冲区里有结果、却在等队首任务的总时间
+        self.buffer_full_waits = 0  # 缓冲区满了、不能再提交新任务的次数
+        self.reorder_delay_total = 0.0  # 每个结果从完成到产出等了多久 (累计)
+        self.reorder_delay_max = 0.0
+
+    @property
+    def reorder_delay_mean(self) -> float:
+        return self.reorder_delay_total / self.results if self.results else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"StreamStats(results={self.results}, max_buffered={self.max_buffered}, "
+            f"head_of_line={self.head_of_line_seconds:.3f}s, buffer_full_waits={self.buffer_full_waits}, "
+            f"reorder_delay_mean={self.reorder_delay_mean * 1000:.1f}ms, "
+            f"reorder_delay_max={self.reorder_delay_max * 1000:.1f}ms)"
+        )
+
+
+def _stream(
+    executor: concurrent.futures.Executor,
+    fn: Callable[[T], Any],
+    inputs: Iterable[T],
+    max_in_flight: int,
+    max_buffer: int,
+    ordered: bool,
+    stats: Optional[StreamStats],
+) -> Iterator[Any]:
+    if max_in_flight < 1 or max_buffer < 0:
+        raise ValueError("max_in_flight 至少为 1, max_buffer 不能为负数")
+    stats = stats if stats is not None else StreamStats()
+    inputs = iter(inputs)
+    running: Dict[concurrent.futures.Future, int] = {}
+    buffer: Dict[int, Tuple[concurrent.futures.Future, float]] = {}  # 下标 -> (已完成的 future, 完成时间)
+    next_submit = 0
+    next_yield = 0
+    exhausted = False
+
+    def fill():
+        nonlocal next_submit, exhausted
+        while not exhausted and len(running) < max_in_flight:
+            # 已提交未产出的任务 = 执行中 + 缓冲区; 队首迟迟不完成时, 最多再多提交 max_buffer 个
+            if ordered and next_submit - next_yield >= max_in_flight + max_buffer:
+                stats.buffer_full_waits += 1
+                return
+            for item in itertools.islice(inputs, 1):
+                running[executor.submit(fn, item)] = next_submit
+                next_submit += 1
+                break
+            else:
+                exhausted = True
+
+    try:
+        fill()
+        while running or buffer:
+            if running:
+                blocked = bool(buffer)
+                start = time.perf_counter()
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                now = time.perf_counter()
+                if blocked:
+                    stats.head_of_line_seconds += now - start
+                for future in done:
+                    buffer[running.pop(future)] = (future, now)
+                stats.max_buffered = max(stats.max_buffered, len(buffer) - (next_yield in buffer))
+
+            # 可以产出的结果: 有序时只能是队首, 无序时是刚完成的任意一个
+            ready = [next_yield] if ordered else list(buffer)
+            while ready and ready[0] in buffer:
+                index = ready.pop(0)
+                future, completed_at = buffer.pop(index)
+                next_yield += 1
+                delay = time.perf_counter() - completed_at
+                stats.reorder_delay_total += delay
+                stats.reorder_delay_max = max(stats.reorder_delay_max, delay)
+                stats.results += 1
+                fill()
+                result = future.result()  # 出错时在这个位置抛出
+                yield result
+                if ordered:
+                    ready.append(next_yield)
+            fill()
+    finally:
+        for future in running:
+            future.cancel()
+
+
+def imap(
+    executor: concurrent.futures.Executor,
+    fn: Callable[[T], Any],
+    inputs: Iterable[T],
+    max_in_flight: int = DEFAULT_IN_FLIGHT,
+    max_buffer: int = DEFAULT_IN_FLIGHT,
+    stats: Optional[StreamStats] = None,
+) -> Iterator[Any]:
+    """按输入顺序尽早产出结果; 等慢任务时继续提交新任务, 直到已提交未产出的任务达到 max_in_flight + max_buffer"""
+    return _stream(executor, fn, inputs, max_in_flight, max_buffer, True, stats)
+
+
+def imap_unordered(
+    executor: concurrent.futures.Executor,
+    fn: Callable[[T], Any],
+    inputs: Iterable[T],
+    max_in_flight: int = DEFAULT_IN_FLIGHT,
+    stats: Optional[StreamStats] = None,
+) -> Iterator[Any]:
+    """按完成顺序产出结果, 在途任务数不超过 max_in_flight; 出错的任务在它完成时抛出异常"""
+    return _stream(executor, fn, inputs, max_in_flight, 0, False, stats)
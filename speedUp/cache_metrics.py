@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+缓存监控指标: Prometheus 文本格式 / JSON 快照
+==========================================
+
+ttl_cache.TTLLRUCache 创建时会自动登记到这里, ttl_lru_cache / structural_cache 装饰的所有函数都不需要改代码就能导出:
+- 命中、未命中、过期、淘汰、合并的并发未命中次数, 当前条目数和字节数
+- 加载耗时直方图 (未命中时真正调用函数的耗时)
+- 节省的时间: 每次命中时按当时的平均加载耗时累加 (估算)
+functools.lru_cache 装饰的函数用 @track_lru_cache 登记, 导出命中、未命中和条目数 (lru_cache 不记录加载耗时)。
+
+同一个函数的多个缓存 (每个实例一个) 按函数的 __qualname__ 汇总。
+计数器 (*_total) 记在每个函数的 FunctionMetrics 上, 不随缓存实例释放或 cache_clear() 减少,
+符合 Prometheus 计数器只增不减的语义; 条目数、字节数是存活缓存的当前值 (gauge)。
+
+    print(prometheus_text())                         # 或者 serve_metrics(9100) 让 Prometheus 抓取 /metrics
+    with JSONSnapshotter("cache_metrics.jsonl", interval=10): ...
+"""
+
+import bisect
+import json
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# 加载耗时直方图的桶上限 (秒), 与 Prometheus 客户端的默认值相同
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """线程安全的直方图: counts[i] 是耗时 <= buckets[i] (且大于上一个桶) 的次数, 最后一格是 +Inf"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, times: int = 1):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += times
+            self.total += seconds * times
+            self.count += times
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.total = 0.0
+            self.count = 0
+
+    def merge(self, other: "LatencyHistogram"):
+        """把 other 的计数加到自己身上 (汇总同一个函数的多个缓存)"""
+        with other._lock:
+            counts, total, count = list(other.counts), other.total, other.count
+        for i, c in enumerate(counts):
+            self.counts[i] += c
+        self.total += total
+        self.count += count
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """[(le, 累计次数), ...], Prometheus 的 _bucket 格式"""
+        result = []
+        running = 0
+        for bound, c in zip(self.buckets + (float("inf"),), self.counts):
+            running += c
+            result.append(("+Inf" if bound == float("inf") else repr(bound), running))
+        return result
+
+
+COUNTERS = ("hits", "misses", "expirations", "evictions", "invalidations", "coalesced", "store_hits")
+GAUGES = ("currsize", "currbytes")
+
+
+class FunctionMetrics:
+    """一个函数的累计指标; 同名的所有缓存共用, 进程内一直保留"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.load_latency = LatencyHistogram()
+        self.time_saved = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, counter: str, n: int = 1):
+        with self._lock:
+            self.counts[counter] += n
+            if counter == "hits":
+                # 按命中当时的平均加载耗时累加: 之后平均值变小, 已经累计的部分也不会变少
+                self.time_saved += n * self.load_latency.mean()
+
+    def copy(self) -> Tuple[Dict[str, int], LatencyHistogram, float]:
+        histogram = LatencyHistogram(self.load_latency.buckets)
+        histogram.merge(self.load_latency)
+        with self._lock:
+            return dict(self.counts), histogram, self.time_saved
+
+
+_functions: Dict[str, FunctionMetrics] = {}
+_caches: "weakref.WeakSet" = weakref.WeakSet()  # 只用来读条目数、字节数
+_lru_functions: List[Tuple[Callable, FunctionMetrics, Dict[str, int]]] = []  # (函数, 指标, 上次读到的 cache_info)
+_caches_lock = threading.Lock()
+
+
+def function_metrics(name: str) -> FunctionMetrics:
+    with _caches_lock:
+        metrics = _functions.get(name)
+        if metrics is None:
+            metrics = _functions[name] = FunctionMetrics(name)
+        return metrics
+
+
+def register_cache(cache: Any) -> FunctionMetrics:
+    """TTLLRUCache.__init__ 调用; 缓存本身只保存弱引用, 返回它要累加计数的 FunctionMetrics"""
+    metrics = function_metrics(cache.namespace or "<anonymous>")
+    with _caches_lock:
+        _caches.add(cache)
+    return metrics
+
+
+def track_lru_cache(func: Callable) -> Callable:
+    """
+    @track_lru_cache
+    @lru_cache(maxsize=128)
+    def f(x): ...
+
+    导出 functools.lru_cache 的 cache_info(); 在 collect() 时读取, 与上次的差值累加到计数器
+    (两次读取之间调用过 cache_clear() 时, 清空前的那部分增量会丢失, 但计数器不会变小)。
+    登记的函数会一直被引用, 适合模块级函数; 局部函数用完后调用 untrack_lru_cache()。
+    """
+    metrics = function_metrics(func.__qualname__)
+    with _caches_lock:
+        _lru_functions.append((func, metrics, {"hits": 0, "misses": 0}))
+    return func
+
+
+def untrack_lru_cache(*funcs: Callable):
+    """取消 track_lru_cache 的登记; 先读一次 cache_info(), 已有的计数留在函数的累计指标里"""
+    with _caches_lock:
+        for entry in [entry for entry in _lru_functions if any(entry[0] is f for f in funcs)]:
+            func, metrics, last = entry
+            _poll_lru(func, metrics, last)
+            _lru_functions.remove(entry)
+
+
+def _poll_lru(func: Callable, metrics: FunctionMetrics, last: Dict[str, int]) -> int:
+    """把 lru_cache 计数的增量加到 metrics 上, 返回当前条目数; 调用者持有 _caches_lock"""
+    info = func.cache_info()
+    for counter in ("hits", "misses"):
+        current = getattr(info, counter)
+        # 变小说明调用过 cache_clear(), 从 0 重新计数
+        metrics.add(counter, current - last[counter] if current >= last[counter] else current)
+        last[counter] = current
+    return info.currsize
+
+
+def collect() -> Dict[str, Dict[str, Any]]:
+    """按函数汇总指标: {函数名: {计数..., "load_latency": LatencyHistogram}}"""
+    gauges: Dict[str, Dict[str, int]] = {}
+    with _caches_lock:
+        caches = list(_caches)
+        for func, metrics, last in _lru_functions:
+            entry = gauges.setdefault(metrics.name, {"currsize": 0, "currbytes": 0, "caches": 0})
+            entry["currsize"] += _poll_lru(func, metrics, last)
+            entry["caches"] += 1
+        all_metrics = list(_functions.values())
+
+    for cache in caches:
+        stats = cache.stats()
+        entry = gauges.setdefault(cache.namespace or "<anonymous>", {"currsize": 0, "currbytes": 0, "caches": 0})
+        entry["currsize"] += stats["currsize"]
+        entry["currbytes"] += stats["currbytes"]
+        entry["caches"] += 1
+
+    functions: Dict[str, Dict[str, Any]] = {}
+    for metrics in all_metrics:
+        counts, histogram, time_saved = metrics.copy()
+        entry = functions[metrics.name] = dict(counts)
+        entry.update(gauges.get(metrics.name, {"currsize": 0, "currbytes": 0, "caches": 0}))
+        lookups = entry["hits"] + entry["misses"]
+        entry["hit_ratio"] = entry["hits"] / lookups if lookups else 0.0
+        entry["time_saved_seconds"] = time_saved
+        entry["load_latency"] = histogram
+    return functions
+
+
+def snapshot() -> Dict[str, Any]:
+    """可以直接 json.dumps 的快照"""
+    functions = {}
+    for name, entry in sorted(collect().items()):
+        histogram: LatencyHistogram = entry.pop("load_latency")
+        entry["load_seconds"] = {
+            "count": histogram.count,
+            "sum": histogram.total,
+            "mean": histogram.mean(),
+            "buckets": dict(histogram.cumulative()),
+        }
+        functions[name] = entry
+    return {"timestamp": time.time(), "functions": functions}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def prometheus_text(prefix: str = "speedup_cache") -> str:
+    """Prometheus 文本格式 (text/plain; version=0.0.4)"""
+    functions = sorted(collect().items())
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help_text: str, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        lines.extend(samples)
+
+    def per_function(metric: str, key: str):
+        return [f'{prefix}_{metric}{{function="{_escape(fn)}"}} {entry[key]}' for fn, entry in functions]
+
+    family("hits_total", "counter", "Cache hits.", per_function("hits_total", "hits"))
+    family("misses_total", "counter", "Cache misses.", per_function("misses_total", "misses"))
+    family("expirations_total", "counter", "Entries dropped because their TTL expired.",
+           per_function("expirations_total", "expirations"))
+    family("evictions_total", "counter", "Entries evicted to respect maxsize or maxbytes.",
+           per_function("evictions_total", "evictions"))
+    family("invalidations_total", "counter", "Entries removed by invalidate().",
+           per_function("invalidations_total", "invalidations"))
+    family("coalesced_total", "counter", "Concurrent misses that waited for an in-flight load.",
+           per_function("coalesced_total", "coalesced"))
+    family("store_hits_total", "counter", "Memory misses served by the second-tier store.",
+           per_function("store_hits_total", "store_hits"))
+    family("entries", "gauge", "Entries currently cached.", per_function("entries", "currsize"))
+    family("bytes", "gauge", "Estimated bytes currently cached (only tracked with maxbytes).",
+           per_function("bytes", "currbytes"))
+    family("time_saved_seconds_total", "counter", "Estimated load time saved by hits (each hit adds the mean load time at that moment).",
+           per_function("time_saved_seconds_total", "time_saved_seconds"))
+
+    samples = []
+    for fn, entry in functions:
+        label = f'function="{_escape(fn)}"'
+        histogram: LatencyHistogram = entry["load_latency"]
+        for le, count in histogram.cumulative():
+            samples.append(f'{prefix}_load_seconds_bucket{{{label},le="{le}"}} {count}')
+        samples.append(f"{prefix}_load_seconds_sum{{{label}}} {histogram.total}")
+        samples.append(f"{prefix}_load_seconds_count{{{label}}} {histogram.count}")
+    family("load_seconds", "histogram", "Time spent computing values on cache misses.", samples)
+
+    return "\n".join(lines) + "\n"
+
+
+class JSONSnapshotter:
+    """后台线程每 interval 秒往 path 追加一行 JSON 快照 (JSON Lines), 退出时再写一次"""
+
+    def __init__(self, path: Union[str, Path], interval: float = 10.0):
+        self.path = Path(path)
+        self.interval = interval
+        self.snapshots = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(snapshot(), ensure_ascii=False) + "\n")
+        self.snapshots += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self) -> "JSONSnapshotter":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def __enter__(self) -> "JSONSnapshotter":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/metrics", "/metrics.json"):
+            self.send_error(404)
+            return
+        if self.path == "/metrics.json":
+            body = json.dumps(snapshot(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            body = prometheus_text().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不在控制台打印每次抓取
+
+
+def serve_metrics(port: int = 9100, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """在后台线程提供 /metrics (Prometheus) 和 /metrics.json; 返回 server, 用 server.shutdown() 停止"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+根据缺失率曲线 (miss-ratio curve) 选择 LRU 缓存大小
+==================================================
+
+逐个 maxsize 重放一遍负载才能知道命中率, 候选值一多就很慢。
+LRU 有"包含性": 容量 c 的缓存里的内容总是容量 c+1 的子集。所以只要对每次访问算出
+栈距离 (上次访问同一个键之后又访问了多少个不同的键, Mattson 算法), 就能一次得到所有容量下的命中数:
+
+    访问在容量 c 的 LRU 中命中  <=>  栈距离 < c
+
+    traced = trace_keys(get_user_info)     # 记录键, 照常调用原函数 (可以是 lru_cache 装饰过的)
+    for user_id in requests:
+        traced(user_id)
+    curve = traced.miss_ratio_curve()        # curve[c] = 容量 c 时的缺失率
+    traced.recommend_maxsize(0.9)            # 命中率达到 90% 的最小 maxsize
+"""
+
+from functools import update_wrapper
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from ttl_cache import make_key
+
+COLD_MISS = -1  # 第一次访问某个键: 多大的缓存都不会命中
+
+
+class _FenwickTree:
+    """树状数组: 单点加、前缀和都是 O(log n)"""
+
+    def __init__(self, size: int):
+        self.tree = [0] * (size + 1)
+
+    def add(self, index: int, delta: int):
+        index += 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, index: int) -> int:
+        """[0, index) 的和"""
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+
+def stack_distances(trace: List[Hashable]) -> List[int]:
+    """每次访问的 LRU 栈距离 (第一次访问为 COLD_MISS)
+
+    时刻 t 访问键 k, k 上一次在时刻 p 被访问: 栈距离 = (p, t) 之间访问过的不同键的个数。
+    树状数组里只在每个键"最近一次访问"的时刻记 1, 区间和就是不同键的个数, 整体 O(n log n)。
+    """
+    tree = _FenwickTree(len(trace))
+    last_seen: Dict[Hashable, int] = {}
+    distances = []
+    for t, key in enumerate(trace):
+        p = last_seen.get(key)
+        if p is None:
+            distances.append(COLD_MISS)
+        else:
+            distances.append(tree.prefix_sum(t) - tree.prefix_sum(p + 1))
+            tree.add(p, -1)
+        tree.add(t, 1)
+        last_seen[key] = t
+    return distances
+
+
+def miss_ratio_curve(trace: List[Hashable]) -> List[float]:
+    """curve[c] = 容量为 c 的 LRU 缓存的缺失率, c 从 0 到不同键的个数 (再大也不会更好)"""
+    if not trace:
+        return [0.0]
+    distances = stack_distances(trace)
+    distinct = distances.count(COLD_MISS)
+    histogram = [0] * distinct
+    for d in distances:
+        if d != COLD_MISS:
+            histogram[d] += 1
+
+    curve = [1.0]
+    hits = 0
+    for d in range(distinct):
+        hits += histogram[d]  # 栈距离为 d 的访问在容量 d+1 及以上时命中
+        curve.append(1 - hits / len(trace))
+    return curve
+
+
+def recommend_maxsize(trace: List[Hashable], target_hit_rate: float) -> Optional[int]:
+    """命中率达到 target_hit_rate 的最小 maxsize; 第一次访问 (冷启动缺失) 太多、达不到时返回 None"""
+    for size, miss_ratio in enumerate(miss_ratio_curve(trace)):
+        if 1 - miss_ratio >= target_hit_rate:
+            return size
+    return None
+
+
+class KeyTracer:
+    """包装任意函数, 记录每次调用的缓存键, 再把调用原样转给它"""
+
+    def __init__(self, func: Callable):
+        self.func = func
+        self.trace: List[Hashable] = []
+        update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        self.trace.append(make_key(args, kwargs))
+        return self.func(*args, **kwargs)
+
+    def miss_ratio_curve(self) -> List[float]:
+        return miss_ratio_curve(self.trace)
+
+    def recommend_maxsize(self, target_hit_rate: float) -> Optional[int]:
+        return recommend_maxsize(self.trace, target_hit_rate)
+
+    def report(self, sizes: Iterable[int]) -> str:
+        curve = self.miss_ratio_curve()
+        lines = [f"{len(self.trace)} 次访问, {len(curve) - 1} 个不同的键"]
+        for size in sizes:
+            miss_ratio = curve[min(size, len(curve) - 1)]
+            lines.append(f"  maxsize={size:>5}: 命中率 {(1 - miss_ratio) * 100:5.1f}%")
+        return "\n".join(lines)
+
+    def clear(self):
+        self.trace.clear()
+
+
+def trace_keys(func: Callable) -> KeyTracer:
+    """可以当装饰器用 (@trace_keys 放在 @lru_cache 上面), 也可以直接包装已有的函数"""
+    return KeyTracer(func)
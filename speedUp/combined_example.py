@@ -4,20 +4,44 @@
 ===========================
 
 演示如何将线程池和LRU缓存结合使用
+DataService 的方法使用 ttl_cache.ttl_lru_cache: 每个实例独立缓存、条目会过期、数据变化时可以单独失效
 """
 
 import time
 import threading
 import concurrent.futures
-from functools import lru_cache
 import random
-from typing import Dict, List, Any
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from cache_metrics import JSONSnapshotter, prometheus_text, snapshot
+from disk_cache import SQLiteStore
+from ttl_cache import ttl_lru_cache
+
+USER_CACHE_TTL = 60      # 用户信息缓存 60 秒
+PRODUCT_CACHE_TTL = 30   # 商品价格变化更频繁, 缓存 30 秒
+
+# 折扣规则
+DISCOUNT_RULES = {
+    ("VIP", "电子"): 0.15,
+    ("VIP", "服装"): 0.20, 
+    ("VIP", "食品"): 0.10,
+    ("钻石", "电子"): 0.25,
+    ("钻石", "服装"): 0.30,
+    ("钻石", "食品"): 0.15,
+}
+DEFAULT_DISCOUNT = 0.05
 
 
 class DataService:
     """数据服务类 - 模拟实际业务场景"""
     
-    def __init__(self):
+    def __init__(self, cache_store: Optional[SQLiteStore] = None,
+                 user_count: int = 20, product_count: int = 10):
+        # 第二层缓存 (磁盘): 传入后内存未命中时先查磁盘, 新实例从磁盘预热
+        self.cache_store = cache_store
+        
         # 模拟数据库
         self.users_db = {
             i: {
@@ -26,7 +50,7 @@ class DataService:
                 "level": random.choice(["普通", "VIP", "钻石"]),
                 "city": random.choice(["北京", "上海", "广州", "深圳"])
             }
-            for i in range(1, 21)
+            for i in range(1, user_count + 1)
         }
         
         self.products_db = {
@@ -36,40 +60,71 @@ class DataService:
                 "price": random.randint(50, 500),
                 "category": random.choice(["电子", "服装", "食品", "图书"])
             }
-            for i in range(1, 11)
+            for i in range(1, product_count + 1)
         }
     
-    @lru_cache(maxsize=128)
+    @ttl_lru_cache(maxsize=128, ttl=USER_CACHE_TTL, store="cache_store")
     def get_user_info(self, user_id: int) -> Dict[str, Any]:
         """获取用户信息 - 使用缓存优化"""
         print(f"    查询用户数据库: user_id={user_id}")
         time.sleep(0.05)  # 模拟数据库查询延迟
         return self.users_db.get(user_id, {"error": "用户不存在"})
     
-    @lru_cache(maxsize=64)
+    @ttl_lru_cache(maxsize=64, ttl=PRODUCT_CACHE_TTL, store="cache_store")
     def get_product_info(self, product_id: int) -> Dict[str, Any]:
         """获取商品信息 - 使用缓存优化"""
         print(f"    查询商品数据库: product_id={product_id}")
         time.sleep(0.03)  # 模拟数据库查询延迟
         return self.products_db.get(product_id, {"error": "商品不存在"})
     
-    @lru_cache(maxsize=32)
+    @ttl_lru_cache(maxsize=32, store="cache_store")
     def calculate_discount(self, user_level: str, product_category: str) -> float:
         """计算折扣 - 使用缓存优化复杂计算"""
         print(f"    计算折扣: {user_level} + {product_category}")
         time.sleep(0.02)  # 模拟复杂计算
         
-        # 折扣规则
-        discounts = {
-            ("VIP", "电子"): 0.15,
-            ("VIP", "服装"): 0.20, 
-            ("VIP", "食品"): 0.10,
-            ("钻石", "电子"): 0.25,
-            ("钻石", "服装"): 0.30,
-            ("钻石", "食品"): 0.15,
-        }
+        return DISCOUNT_RULES.get((user_level, product_category), DEFAULT_DISCOUNT)
+    
+    # ---------- 批量查询: 一次往返加载多条记录, 结果放进与单条查询相同的缓存 ----------
+    
+    def get_users_many(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """批量获取用户信息 - 未命中缓存的 ID 一次查询 (相当于 WHERE id IN (...))"""
+        def load(missing):
+            print(f"    批量查询用户数据库: {len(missing)} 个用户")
+            time.sleep(0.05)  # 一次往返
+            return {(uid,): self.users_db.get(uid, {"error": "用户不存在"}) for (uid,) in missing}
         
-        return discounts.get((user_level, product_category), 0.05)
+        found = self.get_user_info.get_many([(uid,) for uid in user_ids], load)
+        return {uid: info for (uid,), info in found.items()}
+    
+    def get_products_many(self, product_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """批量获取商品信息 - 未命中缓存的 ID 一次查询"""
+        def load(missing):
+            print(f"    批量查询商品数据库: {len(missing)} 个商品")
+            time.sleep(0.03)  # 一次往返
+            return {(pid,): self.products_db.get(pid, {"error": "商品不存在"}) for (pid,) in missing}
+        
+        found = self.get_product_info.get_many([(pid,) for pid in product_ids], load)
+        return {pid: info for (pid,), info in found.items()}
+    
+    def calculate_discounts_many(self, pairs: List[tuple]) -> Dict[tuple, float]:
+        """批量计算折扣 - (用户等级, 商品类别) 组合去重后一次算完"""
+        def load(missing):
+            print(f"    批量计算折扣: {len(missing)} 种组合")
+            time.sleep(0.02)  # 模拟复杂计算 (整批一次)
+            return {pair: DISCOUNT_RULES.get(pair, DEFAULT_DISCOUNT) for pair in missing}
+        
+        return self.calculate_discount.get_many(pairs, load)
+    
+    def update_user(self, user_id: int, **fields):
+        """修改用户数据, 并让这个用户的缓存失效"""
+        self.users_db[user_id] = {**self.users_db.get(user_id, {"id": user_id}), **fields}
+        self.get_user_info.invalidate(user_id)
+    
+    def update_product(self, product_id: int, **fields):
+        """修改商品数据, 并让这个商品的缓存失效"""
+        self.products_db[product_id] = {**self.products_db.get(product_id, {"id": product_id}), **fields}
+        self.get_product_info.invalidate(product_id)
 
 
 def process_single_order(service: DataService, order: Dict[str, Any]) -> Dict[str, Any]:
@@ -93,24 +148,10 @@ def process_single_order(service: DataService, order: Dict[str, Any]) -> Dict[st
         # 计算折扣（可能命中缓存）
         discount = service.calculate_discount(user_info["level"], product_info["category"])
         
-        # 计算最终价格
-        original_price = product_info["price"] * quantity
-        final_price = original_price * (1 - discount)
-        
         # 模拟订单处理时间
         time.sleep(0.01)
         
-        return {
-            "order_id": order_id,
-            "user_name": user_info["name"],
-            "product_name": product_info["name"],
-            "quantity": quantity,
-            "original_price": original_price,
-            "discount": f"{discount*100:.1f}%",
-            "final_price": round(final_price, 2),
-            "status": "成功",
-            "thread": threading.current_thread().name
-        }
+        return price_order(order, user_info, product_info, discount)
         
     except Exception as e:
         return {
@@ -120,6 +161,64 @@ def process_single_order(service: DataService, order: Dict[str, Any]) -> Dict[st
         }
 
 
+def price_order(order: Dict[str, Any], user_info: Dict[str, Any],
+                product_info: Dict[str, Any], discount: float) -> Dict[str, Any]:
+    """计算最终价格, 生成成功的订单结果"""
+    original_price = product_info["price"] * order["quantity"]
+    final_price = original_price * (1 - discount)
+    
+    return {
+        "order_id": order["order_id"],
+        "user_name": user_info["name"],
+        "product_name": product_info["name"],
+        "quantity": order["quantity"],
+        "original_price": original_price,
+        "discount": f"{discount*100:.1f}%",
+        "final_price": round(final_price, 2),
+        "status": "成功",
+        "thread": threading.current_thread().name
+    }
+
+
+def process_order_batch(service: DataService, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """批量处理订单 - 每张表一次批量查询, 耗时与订单数无关, 只与批次数有关"""
+    # 收集去重后的 ID, 每张表一次往返
+    users = service.get_users_many([order["user_id"] for order in orders])
+    products = service.get_products_many([order["product_id"] for order in orders])
+    
+    pairs = [
+        (users[order["user_id"]]["level"], products[order["product_id"]]["category"])
+        for order in orders
+        if "error" not in users[order["user_id"]] and "error" not in products[order["product_id"]]
+    ]
+    discounts = service.calculate_discounts_many(pairs)
+    
+    # 模拟订单处理时间 (整批一次写入)
+    time.sleep(0.01)
+    
+    results = []
+    for order in orders:
+        user_info = users[order["user_id"]]
+        product_info = products[order["product_id"]]
+        if "error" in user_info:
+            results.append({"order_id": order["order_id"], "status": "失败", "error": "用户不存在"})
+        elif "error" in product_info:
+            results.append({"order_id": order["order_id"], "status": "失败", "error": "商品不存在"})
+        else:
+            discount = discounts[(user_info["level"], product_info["category"])]
+            results.append(price_order(order, user_info, product_info, discount))
+    return results
+
+
+def process_orders_batched(service: DataService, orders: List[Dict[str, Any]],
+                           batch_size: int = 1000) -> List[Dict[str, Any]]:
+    """把订单按 batch_size 分组, 逐批调用 process_order_batch"""
+    results = []
+    for i in range(0, len(orders), batch_size):
+        results.extend(process_order_batch(service, orders[i:i + batch_size]))
+    return results
+
+
 def demo_serial_processing():
     """串行处理演示"""
     print("=== 1. 串行处理演示 ===")
@@ -206,6 +305,13 @@ def demo_parallel_processing():
     print(f"  用户查询缓存: {service.get_user_info.cache_info()}")
     print(f"  商品查询缓存: {service.get_product_info.cache_info()}")
     print(f"  折扣计算缓存: {service.calculate_discount.cache_info()}")
+    # 多个线程同时未命中同一个键时只查询一次, 其余线程等待结果 (single-flight)
+    coalesced = {
+        "用户": service.get_user_info.cache_stats()["coalesced"],
+        "商品": service.get_product_info.cache_stats()["coalesced"],
+        "折扣": service.calculate_discount.cache_stats()["coalesced"],
+    }
+    print(f"  并发未命中合并 (省掉的重复查询): {coalesced}")
     
     return parallel_time
 
@@ -272,6 +378,156 @@ def demo_cache_effectiveness():
     print(f"  折扣计算: {cached_service.calculate_discount.cache_info()}")
 
 
+def demo_cache_invalidation():
+    """缓存失效演示: 数据更新时单个键失效 + TTL 过期"""
+    print("\n\n=== 4. 缓存失效演示 ===")
+    
+    service = DataService()
+    print(f"  第一次查询: {service.get_product_info(1)['price']}元")
+    print(f"  再次查询 (命中缓存): {service.get_product_info(1)['price']}元")
+    
+    service.update_product(1, price=999)
+    print(f"  改价后查询 (缓存已失效, 重新查库): {service.get_product_info(1)['price']}元")
+    print(f"  商品查询缓存: {service.get_product_info.cache_stats()}")
+    
+    # 另一个实例有自己的缓存, 互不影响
+    other = DataService()
+    print(f"  另一个实例: {other.get_product_info.cache_info()}")
+    
+    # TTL: 条目过期后自动重新计算
+    @ttl_lru_cache(maxsize=8, ttl=0.1)
+    def get_exchange_rate(currency: str) -> float:
+        print(f"    查询汇率: {currency}")
+        return random.uniform(6.5, 7.5)
+    
+    get_exchange_rate("USD")
+    get_exchange_rate("USD")  # 命中
+    time.sleep(0.15)
+    get_exchange_rate("USD")  # 已过期, 重新查询
+    print(f"  汇率缓存: {get_exchange_rate.cache_stats()}")
+
+
+def demo_batch_processing():
+    """批量查询演示: 逐个订单查询 vs 按批次查询"""
+    print("\n\n=== 5. 批量查询演示 ===")
+    
+    def make_orders(count):
+        return [
+            {
+                "order_id": f"ORD_{i:05d}",
+                "user_id": random.randint(1, 22),     # 少量不存在的用户
+                "product_id": random.randint(1, 10),
+                "quantity": random.randint(1, 3)
+            }
+            for i in range(1, count + 1)
+        ]
+    
+    # 逐个处理: 每个订单至少一次往返, 只跑少量订单估算吞吐量
+    orders = make_orders(200)
+    service = DataService()
+    start = time.time()
+    for order in orders:
+        process_single_order(service, order)
+    single_time = time.time() - start
+    single_rate = len(orders) / single_time
+    
+    # 批量处理: 10000 个订单, 每 1000 个一批
+    orders = make_orders(10000)
+    service = DataService()
+    start = time.time()
+    results = process_orders_batched(service, orders, batch_size=1000)
+    batch_time = time.time() - start
+    batch_rate = len(orders) / batch_time
+    successful = len([r for r in results if r["status"] == "成功"])
+    
+    print(f"\n逐个处理: {single_rate:.0f} 订单/秒 (200 个订单耗时 {single_time:.2f}秒)")
+    print(f"批量处理: {batch_rate:.0f} 订单/秒 (10000 个订单, 10 批, 耗时 {batch_time:.2f}秒, 成功 {successful} 个)")
+    print(f"吞吐量提升: {batch_rate / single_rate:.1f}倍")
+    print(f"  用户查询缓存: {service.get_user_info.cache_info()}")
+    print(f"  商品查询缓存: {service.get_product_info.cache_info()}")
+
+
+def demo_persistent_cache():
+    """两级缓存演示: 内存 LRU + sqlite, 重启 (新建 DataService) 后直接从磁盘预热"""
+    print("\n\n=== 6. 两级缓存 (重启后预热) 演示 ===")
+    
+    orders = [
+        {
+            "order_id": f"ORD_{i:03d}",
+            "user_id": random.randint(1, 20),
+            "product_id": random.randint(1, 10),
+            "quantity": random.randint(1, 3)
+        }
+        for i in range(1, 41)
+    ]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for policy in ("write-through", "write-behind"):
+            path = Path(tmp) / f"{policy}.sqlite3"
+            
+            # 第一次运行: 冷启动, 查询结果写入磁盘
+            store = SQLiteStore(path, serializer="json", write_policy=policy)
+            service = DataService(cache_store=store)
+            start = time.time()
+            for order in orders:
+                process_single_order(service, order)
+            cold_time = time.time() - start
+            store.close()  # 模拟进程退出 (write-behind 会在这里把剩下的修改写盘)
+            cold_summary = store.summary()
+            
+            # 重启: 新的 DataService 内存缓存为空, 从磁盘预热
+            store = SQLiteStore(path, serializer="json", write_policy=policy)
+            restarted = DataService(cache_store=store)
+            restarted.users_db, restarted.products_db = service.users_db, service.products_db
+            start = time.time()
+            for order in orders:
+                process_single_order(restarted, order)
+            warm_time = time.time() - start
+            
+            print(f"\n  {policy}:")
+            print(f"    冷启动耗时: {cold_time:.2f}秒, 重启后耗时: {warm_time:.2f}秒")
+            print(f"    重启后用户查询缓存: {restarted.get_user_info.cache_info()}, "
+                  f"预热 {restarted.get_user_info.cache_stats()['warmed']} 条")
+            print(f"    第一次运行写盘: {cold_summary}")
+            store.close()
+
+
+def demo_cache_metrics():
+    """缓存监控指标演示: 所有 ttl_lru_cache 自动登记, 导出 Prometheus 文本和 JSON 快照"""
+    print("\n\n=== 7. 缓存监控指标演示 ===")
+    
+    service = DataService()
+    orders = [
+        {
+            "order_id": f"ORD_{i:03d}",
+            "user_id": random.randint(1, 20),
+            "product_id": random.randint(1, 10),
+            "quantity": random.randint(1, 3)
+        }
+        for i in range(1, 41)
+    ]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache_metrics.jsonl"
+        # 长期运行的服务里 interval 一般是 10~60 秒
+        with JSONSnapshotter(path, interval=0.5) as snapshotter:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(lambda order: process_single_order(service, order), orders))
+        print(f"\n  JSON 快照: 写了 {snapshotter.snapshots} 行到 {path.name}")
+    
+    # 计数器按函数累计, 前面几个演示的 DataService (即使已经被回收) 也算在里面
+    for name, entry in snapshot()["functions"].items():
+        if name.startswith("DataService."):
+            print(f"  {name}: 命中率 {entry['hit_ratio'] * 100:.1f}%, "
+                  f"平均加载 {entry['load_seconds']['mean'] * 1000:.1f}ms, "
+                  f"节省约 {entry['time_saved_seconds']:.2f}秒")
+    
+    print("\n  Prometheus 文本 (节选):")
+    for line in prometheus_text().splitlines():
+        if "get_user_info" in line and "_bucket" not in line:
+            print(f"    {line}")
+
+
 def main():
     """主函数"""
     print("🔄 线程池 + LRU缓存 综合应用示例")
@@ -281,6 +537,10 @@ def main():
     serial_time = demo_serial_processing()
     parallel_time = demo_parallel_processing()
     demo_cache_effectiveness()
+    demo_cache_invalidation()
+    demo_batch_processing()
+    demo_persistent_cache()
+    demo_cache_metrics()
     
     # 总结
     print("\n" + "="*60)
@@ -293,7 +553,12 @@ def main():
     print("1. 线程池：通过并发执行提升整体处理速度")
     print("2. LRU缓存：避免重复的数据库查询和计算")
     print("3. 两者结合：获得最佳的性能优化效果")
-    print("4. 线程安全：lru_cache 是线程安全的")
+    print("4. 线程安全：ttl_lru_cache 和 lru_cache 一样是线程安全的")
+    print("5. 数据一致：TTL 过期 + 数据更新时 invalidate, 避免返回旧数据")
+    print("6. 合并请求：并发未命中同一个键时只查询一次 (lru_cache 会各自查询)")
+    print("7. 批量查询：按批次一次加载所有 ID, 耗时取决于批次数而不是订单数")
+    print("8. 两级缓存：内存 LRU + sqlite, 重启后从磁盘预热, 不必重新查询")
+    print("9. 可观测：命中率、加载耗时直方图、节省的时间可导出为 Prometheus / JSON")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+缓存的第二层: 本地 sqlite 持久化存储
+==================================
+
+内存 LRU 在进程重启后是空的, 重启后的第一波请求要全部重新查询。
+SQLiteStore 作为 ttl_cache.TTLLRUCache 的第二层 (store 参数):
+- 内存未命中时先查磁盘, 命中后放回内存
+- 新建缓存时从磁盘预热最近写入的条目 (warm start)
+- 写入策略: write-through (每次 set 立即写盘) 或 write-behind (后台线程批量写盘)
+- 序列化格式可配置: pickle / json / marshal, 也可以传入自己的 (dumps, loads);
+  写入时立即序列化, 无法序列化的值记一条警告后跳过 (只在内存里缓存), 不影响同一批的其他条目
+
+    store = SQLiteStore("cache.sqlite3", serializer="json", write_policy="write-behind")
+
+    @ttl_lru_cache(maxsize=128, ttl=60, store=store)
+    def get_user_info(user_id): ...
+"""
+
+import atexit
+import json
+import logging
+import marshal
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+SERIALIZERS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "pickle": (pickle.dumps, pickle.loads),
+    "json": (lambda value: json.dumps(value, ensure_ascii=False).encode("utf-8"), json.loads),
+    "marshal": (marshal.dumps, marshal.loads),
+}
+
+WRITE_THROUGH = "write-through"
+WRITE_BEHIND = "write-behind"
+
+_DELETE = object()  # write-behind 队列里表示删除
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStore:
+    """线程安全的 sqlite 键值存储; 多个缓存用 namespace 区分 (默认是被缓存函数的名字)"""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        serializer: Union[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = "pickle",
+        write_policy: str = WRITE_THROUGH,
+        flush_interval: float = 0.5,
+        flush_size: int = 512,
+    ):
+        if write_policy not in (WRITE_THROUGH, WRITE_BEHIND):
+            raise ValueError(f"未知的写入策略: {write_policy}")
+        self.path = Path(path)
+        self.dumps, self.loads = SERIALIZERS[serializer] if isinstance(serializer, str) else serializer
+        self.write_policy = write_policy
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+
+        self.reads = 0
+        self.writes = 0
+        self.flushes = 0
+        self.skipped = 0  # 无法序列化而没有写盘的值
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # 读写互不阻塞, 多个进程也可以共用
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                expires_at REAL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        self._conn.commit()
+
+        # write-behind: (namespace, key) -> (序列化后的值, expires_at, 写入时间) 或 _DELETE, 后台线程批量写入
+        self._pending: Dict[Tuple[str, str], Any] = {}
+        self._last_stamp = 0.0
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flusher = None
+        if write_policy == WRITE_BEHIND:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+        atexit.register(self.close)
+
+    # ---------- 读 ----------
+
+    def get(self, namespace: str, key: str) -> Tuple[bool, Any, Optional[float]]:
+        """返回 (是否找到, 值, 过期时间戳); 已过期的当作没找到"""
+        with self._lock:
+            self.reads += 1
+            pending = self._pending.get((namespace, key))
+            if pending is _DELETE:
+                return False, None, None
+            if pending is not None:
+                row = pending[:2]  # 还没写盘的新值, 读到的是最新的
+            else:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                ).fetchone()
+
+        if row is None:
+            return False, None, None
+        blob, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return False, None, None
+        return True, self.loads(blob), expires_at
+
+    def recent(self, namespace: str, limit: Optional[int]) -> List[Tuple[str, Any, Optional[float]]]:
+        """最近写入、还没过期的条目, 按写入时间从旧到新, 用于预热内存缓存"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT key, value, expires_at FROM cache
+                   WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)
+                   ORDER BY updated_at DESC LIMIT ?""",
+                (namespace, time.time(), -1 if limit is None else limit),
+            ).fetchall()
+        return [(key, self.loads(blob), expires_at) for key, blob, expires_at in reversed(rows)]
+
+    # ---------- 写 ----------
+
+    def put(self, namespace: str, key: str, value: Any, expires_at: Optional[float]):
+        try:
+            blob = self.dumps(value)
+        except Exception as e:
+            # 只影响这一个值: 它留在内存缓存里, 磁盘上删掉旧值, 以免之后读到过时的结果
+            logger.warning("无法序列化 %s/%s, 不写入磁盘: %r", namespace, key, e)
+            with self._lock:
+                self.skipped += 1
+            self.delete(namespace, key)
+            return
+
+        if self.write_policy == WRITE_THROUGH:
+            with self._lock:
+                self._write([((namespace, key), (blob, expires_at, self._stamp()))])
+            return
+
+        with self._lock:
+            # 写入时间在放进队列时记下, 同一批写盘的条目仍然保留先后顺序, recent() 才能选出最近的
+            self._pending[(namespace, key)] = (blob, expires_at, self._stamp())
+            if len(self._pending) >= self.flush_size:
+                self._wakeup.set()
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            if self.write_policy == WRITE_THROUGH:
+                self._write([((namespace, key), _DELETE)])
+            else:
+                self._pending[(namespace, key)] = _DELETE
+
+    def clear(self, namespace: str):
+        with self._lock:
+            self._pending = {k: v for k, v in self._pending.items() if k[0] != namespace}
+            self._conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+    def flush(self):
+        """把 write-behind 队列里的修改写盘 (write-through 时什么都不做)"""
+        with self._lock:
+            if self._pending:
+                # 写成功之后才清空队列; 写盘失败时这一批留着, 下次再写
+                self._write(self._pending.items())
+                self._pending = {}
+
+    def _stamp(self) -> float:
+        """写入时间, 严格递增 (同一时刻的两次写入也分得出先后); 调用者持有 self._lock"""
+        self._last_stamp = max(time.time(), self._last_stamp + 1e-6)
+        return self._last_stamp
+
+    def _write(self, items):
+        """调用者持有 self._lock; 一批修改放在一个事务里"""
+        upserts = []
+        deletes = []
+        for (namespace, key), item in items:
+            if item is _DELETE:
+                deletes.append((namespace, key))
+            else:
+                blob, expires_at, updated_at = item
+                upserts.append((namespace, key, blob, expires_at, updated_at))
+
+        with self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)", upserts
+                )
+            if deletes:
+                self._conn.executemany(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?", deletes
+                )
+        self.writes += len(upserts) + len(deletes)
+        self.flushes += 1
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # 后台线程不能因为一次写盘失败就退出, 队列保留到下一轮重试
+                logger.exception("write-behind 写盘失败, %.1f 秒后重试", self.flush_interval)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        with self._lock:
+            self._conn.close()
+        atexit.unregister(self.close)
+
+    def summary(self) -> str:
+        return (
+            f"{self.write_policy}, reads={self.reads}, "
+            f"writes={self.writes} in {self.flushes} transactions, skipped={self.skipped}"
+        )
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+LRU 之外的淘汰策略: LFU / ARC / W-TinyLFU
+========================================
+
+LRU 只看"最近有没有用过": 一次性扫描 (比如报表任务把所有用户查一遍) 会把热门条目全部挤出去。
+这里的策略只负责决定"淘汰谁", 值和 TTL / maxbytes / single-flight 仍由 ttl_cache.TTLLRUCache 管理:
+
+    @ttl_lru_cache(maxsize=256, policy="w-tinylfu")
+    def get_user_info(self, user_id): ...
+
+- lfu: 访问次数最少的先淘汰 (次数相同时淘汰最久没用的); 新条目次数为 1, 扫描进来的条目最先被淘汰,
+  但没有衰减, 过去很热、现在没人用的条目会一直占着位置
+- arc: 自适应替换缓存, 把条目分成"只用过一次"(T1) 和"用过多次"(T2) 两部分, 再各记一份刚淘汰的键 (B1/B2, 只有键),
+  根据在哪份记录里再次命中自动调整两部分的大小
+- w-tinylfu: 新条目先进 1% 的窗口 LRU; 从窗口出来时和主区 (SLRU) 里要淘汰的条目比较频率 (Count-Min 计数),
+  频率更高的才能留下; 计数定期减半, 热点变化后旧的频率会衰减
+
+所有策略实现同一组方法 (调用者持有缓存的锁, 策略本身不加锁):
+    access(key)  命中          miss(key)    未命中
+    insert(key)  新条目放进缓存  remove(key)  条目因失效/过期被删除
+    evict()      选出一个淘汰的键并忘掉它, 返回这个键
+"""
+
+import sys
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class LFUPolicy:
+    """O(1) LFU: 每个访问次数一个桶 (OrderedDict, 桶内按 LRU 顺序)"""
+
+    name = "lfu"
+
+    def __init__(self, maxsize: Optional[int]):
+        self.maxsize = maxsize
+        self.freq: Dict[Hashable, int] = {}
+        self.buckets: Dict[int, "OrderedDict[Hashable, None]"] = {}
+        self.min_freq = 0
+
+    def _unlink(self, key: Hashable) -> int:
+        count = self.freq.pop(key)
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+        return count
+
+    def access(self, key: Hashable):
+        count = self._unlink(key) + 1
+        self.freq[key] = count
+        self.buckets.setdefault(count, OrderedDict())[key] = None
+        if count - 1 == self.min_freq and count - 1 not in self.buckets:
+            self.min_freq = count
+
+    def miss(self, key: Hashable):
+        pass
+
+    def insert(self, key: Hashable):
+        self.freq[key] = 1
+        self.buckets.setdefault(1, OrderedDict())[key] = None
+        self.min_freq = 1
+
+    def remove(self, key: Hashable):
+        self._unlink(key)
+
+    def evict(self) -> Hashable:
+        if self.min_freq not in self.buckets:
+            self.min_freq = min(self.buckets)  # remove() 之后最小次数可能变了
+        key, _ = self.buckets[self.min_freq].popitem(last=False)
+        del self.freq[key]
+        if not self.buckets[self.min_freq]:
+            del self.buckets[self.min_freq]
+        return key
+
+    def clear(self):
+        self.freq.clear()
+        self.buckets.clear()
+        self.min_freq = 0
+
+    def metadata_bytes(self) -> int:
+        return sys.getsizeof(self.freq) + sum(sys.getsizeof(b) for b in self.buckets.values())
+
+
+class ARCPolicy:
+    """Adaptive Replacement Cache (Megiddo & Modha): T1/T2 是缓存里的键, B1/B2 是最近淘汰的键"""
+
+    name = "arc"
+
+    def __init__(self, maxsize: Optional[int]):
+        if maxsize is None:
+            raise ValueError("arc 需要指定 maxsize")
+        self.maxsize = maxsize
+        self.p = 0.0  # T1 的目标大小
+        self.t1: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.t2: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.b1: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.b2: "OrderedDict[Hashable, None]" = OrderedDict()
+        self._from_b2 = False
+
+    def access(self, key: Hashable):
+        if key in self.t1:
+            del self.t1[key]
+            self.t2[key] = None
+        else:
+            self.t2.move_to_end(key)
+
+    def miss(self, key: Hashable):
+        pass
+
+    def insert(self, key: Hashable):
+        self._from_b2 = False
+        if key in self.b1:
+            # 最近因为 T1 太小被淘汰的键又被访问了: 让 T1 大一些
+            self.p = min(self.maxsize, self.p + max(len(self.b2) / len(self.b1), 1))
+            del self.b1[key]
+            self.t2[key] = None
+        elif key in self.b2:
+            self.p = max(0.0, self.p - max(len(self.b1) / len(self.b2), 1))
+            del self.b2[key]
+            self.t2[key] = None
+            self._from_b2 = True
+        else:
+            self.t1[key] = None
+
+    def remove(self, key: Hashable):
+        if key in self.t1:
+            del self.t1[key]
+        else:
+            del self.t2[key]
+
+    def evict(self) -> Hashable:
+        if self.t1 and (
+            len(self.t1) > self.p or (self._from_b2 and len(self.t1) == int(self.p)) or not self.t2
+        ):
+            key, _ = self.t1.popitem(last=False)
+            self.b1[key] = None
+        else:
+            key, _ = self.t2.popitem(last=False)
+            self.b2[key] = None
+        # |T1| + |B1| <= c, 四个列表合计 <= 2c
+        while self.b1 and len(self.t1) + len(self.b1) > self.maxsize:
+            self.b1.popitem(last=False)
+        while len(self.t1) + len(self.t2) + len(self.b1) + len(self.b2) > 2 * self.maxsize:
+            (self.b2 or self.b1).popitem(last=False)
+        return key
+
+    def clear(self):
+        for part in (self.t1, self.t2, self.b1, self.b2):
+            part.clear()
+        self.p = 0.0
+
+    def metadata_bytes(self) -> int:
+        return sum(sys.getsizeof(part) for part in (self.t1, self.t2, self.b1, self.b2))
+
+
+_HALVE = bytes(i // 2 for i in range(256))  # bytearray.translate 一次把所有计数减半
+
+
+class _CountMinSketch:
+    """4 行 x width 的计数器 (每个最大 15), 估计某个键最近的访问次数"""
+
+    MULTIPLIERS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+
+    def __init__(self, maxsize: int):
+        width = 16
+        while width < maxsize * 2:
+            width *= 2
+        self.mask = width - 1
+        self.rows = [bytearray(width) for _ in self.MULTIPLIERS]
+        self.additions = 0
+        self.sample_size = 10 * maxsize
+
+    def _indexes(self, key: Hashable):
+        h = hash(key)
+        return [((h * m) >> 24) & self.mask for m in self.MULTIPLIERS]
+
+    def increment(self, key: Hashable):
+        for row, i in zip(self.rows, self._indexes(key)):
+            if row[i] < 15:
+                row[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            # 定期减半: 旧的频率逐渐衰减, 热点变了以后新的热门条目能进来
+            for row in self.rows:
+                row[:] = row.translate(_HALVE)
+            self.additions //= 2
+
+    def frequency(self, key: Hashable) -> int:
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+    def clear(self):
+        for row in self.rows:
+            row[:] = bytes(len(row))
+        self.additions = 0
+
+    def nbytes(self) -> int:
+        return sum(len(row) for row in self.rows)
+
+
+class WTinyLFUPolicy:
+    """W-TinyLFU (Caffeine 的做法): 窗口 LRU + TinyLFU 准入 + 主区 SLRU (probation 20% / protected 80%)"""
+
+    name = "w-tinylfu"
+
+    def __init__(self, maxsize: Optional[int], window_ratio: float = 0.01):
+        if maxsize is None:
+            raise ValueError("w-tinylfu 需要指定 maxsize")
+        self.maxsize = maxsize
+        self.window_size = max(1, int(maxsize * window_ratio))
+        main_size = max(0, maxsize - self.window_size)
+        self.protected_size = int(main_size * 0.8)
+        self.main_size = main_size
+        self.sketch = _CountMinSketch(maxsize)
+        self.window: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.probation: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.protected: "OrderedDict[Hashable, None]" = OrderedDict()
+        self._candidate = None  # 刚从窗口出来、等待准入判断的键
+        self.admitted = 0
+        self.rejected = 0
+
+    def access(self, key: Hashable):
+        self.sketch.increment(key)
+        if key in self.window:
+            self.window.move_to_end(key)
+        elif key in self.probation:
+            del self.probation[key]
+            self.protected[key] = None
+            if len(self.protected) > self.protected_size:
+                demoted, _ = self.protected.popitem(last=False)
+                self.probation[demoted] = None
+        else:
+            self.protected.move_to_end(key)
+
+    def miss(self, key: Hashable):
+        self.sketch.increment(key)
+
+    def insert(self, key: Hashable):
+        self.window[key] = None
+        while len(self.window) > self.window_size:
+            candidate, _ = self.window.popitem(last=False)
+            self.probation[candidate] = None
+            if len(self.probation) + len(self.protected) > self.main_size:
+                self._candidate = candidate  # 主区满了, 下一次 evict() 决定留下谁
+
+    def remove(self, key: Hashable):
+        if key == self._candidate:
+            self._candidate = None
+        for part in (self.window, self.probation, self.protected):
+            if key in part:
+                del part[key]
+                return
+
+    def evict(self) -> Hashable:
+        candidate, self._candidate = self._candidate, None
+        if candidate is not None and candidate in self.probation:
+            victim = next(iter(self.probation))
+            if victim == candidate and len(self.probation) == 1:
+                victim = next(iter(self.protected), candidate)
+            if victim != candidate and self.sketch.frequency(candidate) > self.sketch.frequency(victim):
+                self.admitted += 1
+                self.remove(victim)
+                return victim
+            self.rejected += 1
+            del self.probation[candidate]
+            return candidate
+        # maxbytes 超限等情况: 依次从 probation / protected / 窗口的 LRU 端淘汰
+        for part in (self.probation, self.protected, self.window):
+            if part:
+                key, _ = part.popitem(last=False)
+                return key
+        raise KeyError("缓存是空的")
+
+    def clear(self):
+        for part in (self.window, self.probation, self.protected):
+            part.clear()
+        self.sketch.clear()
+        self._candidate = None
+
+    def metadata_bytes(self) -> int:
+        containers = sum(sys.getsizeof(part) for part in (self.window, self.probation, self.protected))
+        return containers + self.sketch.nbytes()
+
+
+POLICIES = {
+    "lfu": LFUPolicy,
+    "arc": ARCPolicy,
+    "w-tinylfu": WTinyLFUPolicy,
+}
+
+
+def make_policy(name: Optional[str], maxsize: Optional[int]):
+    """name 为 None 或 "lru" 时返回 None, 缓存使用内置的 OrderedDict LRU (最快)"""
+    if name is None or name == "lru":
+        return None
+    if name not in POLICIES:
+        raise ValueError(f"未知的淘汰策略: {name}, 可选: lru, {', '.join(POLICIES)}")
+    return POLICIES[name](maxsize)
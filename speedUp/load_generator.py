@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+订单处理压测工具
+================
+
+demo 里 20 个订单、randint(1, 5) 的用户分布说明不了生产规模下的表现。
+这里对 process_single_order 做可配置的压测:
+- 订单数、用户/商品数量
+- 键分布: uniform (均匀) / zipf (少数热门用户占大部分订单) / hotspot (hot_fraction 的键占 hot_probability 的访问)
+- 到达方式: 开环 (按 rate 订单/秒的泊松过程到达, 不管系统处理得多快) 或
+  闭环 (rate=None: clients 个请求同时在途, 完成一个才发下一个, 像 clients 个用户各自点完再点)
+- 线程数、缓存 maxsize 可以给多个值做网格对比
+
+报告吞吐量、p50/p95/p99 延迟和各个缓存的命中率, 用来根据数据选择 maxsize 和 max_workers。
+开环模式下延迟从"计划到达时间"算起, 包含排队时间, 不会因为系统变慢而少发请求 (避免 coordinated omission);
+闭环模式下每个请求的延迟从它自己提交的时刻算起, 吞吐量随 workers 增加而上升、直到延迟开始变长的地方就是合适的 max_workers。
+
+    python load_generator.py --orders 5000 --users 2000 --distribution zipf --rate 800 --workers 8 16 32 --maxsize 64 256 1024
+"""
+
+import argparse
+import bisect
+import concurrent.futures
+import contextlib
+import io
+import itertools
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from bounded_executor import bounded_as_completed
+from combined_example import DataService, process_single_order
+
+CACHED_METHODS = ("get_user_info", "get_product_info", "calculate_discount")
+
+
+# ---------- 键分布 ----------
+
+def uniform_sampler(n: int, rng: random.Random) -> Callable[[], int]:
+    return lambda: rng.randint(1, n)
+
+
+def zipf_sampler(n: int, rng: random.Random, s: float = 1.1) -> Callable[[], int]:
+    """第 k 个键的概率正比于 1 / k^s; s 越大越集中在少数键上"""
+    cum_weights = list(itertools.accumulate(1 / k ** s for k in range(1, n + 1)))
+    total = cum_weights[-1]
+    # 同一批键的编号打乱一次, 热门用户不总是 1, 2, 3 ...
+    keys = list(range(1, n + 1))
+    rng.shuffle(keys)
+    return lambda: keys[bisect.bisect_left(cum_weights, rng.random() * total)]
+
+
+def hotspot_sampler(n: int, rng: random.Random, hot_fraction: float = 0.1,
+                    hot_probability: float = 0.9) -> Callable[[], int]:
+    """hot_fraction 的键 (热点) 占 hot_probability 的访问, 其余访问均匀落在冷键上"""
+    hot = max(1, int(n * hot_fraction))
+
+    def sample():
+        if rng.random() < hot_probability or hot == n:
+            return rng.randint(1, hot)
+        return rng.randint(hot + 1, n)
+
+    return sample
+
+
+DISTRIBUTIONS = {
+    "uniform": uniform_sampler,
+    "zipf": zipf_sampler,
+    "hotspot": hotspot_sampler,
+}
+
+
+def make_orders(count: int, users: int, products: int, distribution: str = "zipf",
+                seed: int = 0, **params) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    user_sampler = DISTRIBUTIONS[distribution](users, rng, **params)
+    product_sampler = DISTRIBUTIONS[distribution](products, rng, **params)
+    return [
+        {
+            "order_id": f"ORD_{i:06d}",
+            "user_id": user_sampler(),
+            "product_id": product_sampler(),
+            "quantity": rng.randint(1, 3)
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+# ---------- 压测 ----------
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法 (nearest-rank)"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def arrival_times(count: int, rate: float, seed: int = 0) -> List[float]:
+    """开环模式下相对开始时间的计划到达时刻"""
+    rng = random.Random(seed + 1)
+    t = 0.0
+    times = []
+    for _ in range(count):
+        t += rng.expovariate(rate)  # 泊松过程: 到达间隔服从指数分布
+        times.append(t)
+    return times
+
+
+def run_load(service: DataService, orders: List[Dict[str, Any]], workers: int,
+             rate: Optional[float] = None, seed: int = 0, clients: Optional[int] = None) -> Dict[str, Any]:
+    """
+    开环 (rate 订单/秒): 按计划时刻把订单提交到线程池, 延迟从计划到达时刻算起
+    闭环 (rate=None): 始终有 clients (默认等于 workers) 个订单在途, 延迟从每个订单自己提交的时刻算起
+    """
+    clients = clients or workers
+    latencies: List[float] = []
+    failed = 0
+    lock = threading.Lock()
+
+    def handle(order, planned_at):
+        nonlocal failed
+        result = process_single_order(service, order)
+        latency = time.perf_counter() - planned_at
+        with lock:
+            latencies.append(latency)
+            if result["status"] != "成功":
+                failed += 1
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        if rate is None:
+            # 生成器在提交前一刻才产出 (订单, 当前时间), 所以时间戳就是这个订单的提交时刻
+            submissions = ((order, time.perf_counter()) for order in orders)
+            for _, future in bounded_as_completed(executor, lambda item: handle(*item), submissions, clients):
+                future.result()
+        else:
+            for order, offset in zip(orders, arrival_times(len(orders), rate, seed)):
+                planned_at = start + offset
+                delay = planned_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(handle, order, planned_at)
+    elapsed = time.perf_counter() - start
+
+    caches = {}
+    total_hits = total_lookups = 0
+    for name in CACHED_METHODS:
+        info = getattr(service, name).cache_info()
+        lookups = info.hits + info.misses
+        caches[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "currsize": info.currsize,
+            "hit_ratio": info.hits / lookups if lookups else 0.0,
+        }
+        total_hits += info.hits
+        total_lookups += lookups
+
+    return {
+        "orders": len(orders),
+        "failed": failed,
+        "elapsed": elapsed,
+        "throughput": len(orders) / elapsed,
+        "offered_rate": rate,
+        "clients": None if rate is not None else clients,
+        "latency": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+        },
+        "hit_ratio": total_hits / total_lookups if total_lookups else 0.0,
+        "caches": caches,
+    }
+
+
+def set_cache_maxsize(service: DataService, maxsize: Optional[int]):
+    """压测时覆盖装饰器里的 maxsize (每个实例的缓存各自生效)"""
+    for name in CACHED_METHODS:
+        getattr(service, name).cache.maxsize = maxsize
+
+
+def run_grid(orders: List[Dict[str, Any]], users: int, products: int, workers_list: List[int],
+             maxsize_list: List[Optional[int]], rate: Optional[float], seed: int,
+             quiet: bool = True, clients: Optional[int] = None) -> List[Dict[str, Any]]:
+    results = []
+    for maxsize in maxsize_list:
+        for workers in workers_list:
+            service = DataService(user_count=users, product_count=products)
+            set_cache_maxsize(service, maxsize)
+            # DataService 每次查库都会打印一行, 压测时关掉
+            output = io.StringIO() if quiet else None
+            with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+                result = run_load(service, orders, workers, rate, seed, clients)
+            result.update({"workers": workers, "maxsize": maxsize})
+            results.append(result)
+            print_result(result)
+    return results
+
+
+def print_header():
+    print(f"{'maxsize':>8}{'workers':>8}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'hit%':>7}{'user hit%':>10}{'prod hit%':>10}")
+
+
+def print_result(result: Dict[str, Any]):
+    latency = result["latency"]
+    caches = result["caches"]
+    print(f"{str(result['maxsize']):>8}{result['workers']:>8}{result['throughput']:>10.1f}"
+          f"{latency['p50'] * 1000:>9.1f}{latency['p95'] * 1000:>9.1f}{latency['p99'] * 1000:>9.1f}"
+          f"{result['hit_ratio'] * 100:>7.1f}"
+          f"{caches['get_user_info']['hit_ratio'] * 100:>10.1f}"
+          f"{caches['get_product_info']['hit_ratio'] * 100:>10.1f}")
+
+
+def parse_maxsize(text: str) -> Optional[int]:
+    return None if text.lower() == "none" else int(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="process_single_order 压测")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="zipf")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="zipf 指数")
+    parser.add_argument("--hot-fraction", type=float, default=0.1)
+    parser.add_argument("--hot-probability", type=float, default=0.9)
+    parser.add_argument("--rate", type=float, default=None, help="开环到达速率 (订单/秒), 不指定则闭环")
+    parser.add_argument("--clients", type=int, default=None, help="闭环时同时在途的订单数, 默认等于 workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--maxsize", type=parse_maxsize, nargs="+", default=[128],
+                        help="缓存 maxsize, 可以给多个值; none 表示不限")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    params = {}
+    if args.distribution == "zipf":
+        params = {"s": args.zipf_s}
+    elif args.distribution == "hotspot":
+        params = {"hot_fraction": args.hot_fraction, "hot_probability": args.hot_probability}
+    orders = make_orders(args.orders, args.users, args.products, args.distribution, args.seed, **params)
+
+    distinct_users = len({order["user_id"] for order in orders})
+    if args.rate:
+        mode = f"开环 {args.rate:.0f} 订单/秒"
+    else:
+        mode = f"闭环, 每次 {args.clients} 个订单在途" if args.clients else "闭环, 在途订单数 = workers"
+    print(f"{args.orders} 个订单, {args.distribution} 分布, {distinct_users}/{args.users} 个用户被访问, {mode}\n")
+    print_header()
+    results = run_grid(orders, args.users, args.products, args.workers, args.maxsize, args.rate, args.seed,
+                       clients=args.clients)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,14 @@ LRU缓存 (@lru_cache) 教程
 """
 
 import time
+from dataclasses import dataclass
 from functools import lru_cache
 import random
 
+from cache_metrics import track_lru_cache, untrack_lru_cache
+from cache_sizing import trace_keys
+from structural_cache import structural_cache
+
 
 def demo_basic_usage():
     """基础使用演示"""
@@ -23,6 +28,7 @@ def demo_basic_usage():
         return n * n
 
     # 有缓存版本
+    @track_lru_cache
     @lru_cache(maxsize=128)
     def cached_calculation(n: int) -> int:
         """带缓存的计算"""
@@ -50,12 +56,15 @@ def demo_basic_usage():
 
     # 查看缓存统计
     print(f"缓存统计: {cached_calculation.cache_info()}")
+    # 局部函数每次调用演示都会新建一个, 结束时取消登记 (计数已经累加进 cache_metrics)
+    untrack_lru_cache(cached_calculation)
 
 
 def demo_cache_management():
     """缓存管理演示"""
     print("\n\n=== 2. 缓存管理演示 ===")
 
+    @track_lru_cache
     @lru_cache(maxsize=32)
     def fibonacci(n: int) -> int:
         """斐波那契数列（递归+缓存优化）"""
@@ -76,6 +85,9 @@ def demo_cache_management():
         f"命中率: {cache_info.hits / (cache_info.hits + cache_info.misses) * 100:.1f}%"
     )
 
+    # 清理之前取消登记, cache_clear() 之前的计数先累加进 cache_metrics
+    untrack_lru_cache(fibonacci)
+
     # 清理缓存
     print("\n清理缓存...")
     fibonacci.cache_clear()
@@ -95,6 +107,7 @@ def demo_database_query():
         5: {"name": "钱七", "age": 27, "city": "杭州"},
     }
 
+    @track_lru_cache
     @lru_cache(maxsize=64)
     def get_user_info(user_id: int) -> dict:
         """获取用户信息（模拟数据库查询）"""
@@ -120,12 +133,14 @@ def demo_database_query():
     print(f"  缓存统计: {cache_info}")
     print(f"  实际数据库查询次数: {cache_info.misses}")
     print(f"  缓存节省的查询次数: {cache_info.hits}")
+    untrack_lru_cache(get_user_info)
 
 
 def demo_complex_parameters():
     """复杂参数缓存演示"""
     print("\n\n=== 4. 复杂参数缓存演示 ===")
 
+    @track_lru_cache
     @lru_cache(maxsize=100)
     def complex_calculation(x: float, y: float, operation: str) -> float:
         """复杂计算函数"""
@@ -158,18 +173,21 @@ def demo_complex_parameters():
         print(f"  结果: {x} {op} {y} = {result}")
 
     print(f"\n缓存统计: {complex_calculation.cache_info()}")
+    untrack_lru_cache(complex_calculation)
 
 
 def demo_cache_size_effects():
     """缓存大小效果演示"""
     print("\n\n=== 5. 缓存大小效果演示 ===")
 
+    @track_lru_cache
     @lru_cache(maxsize=5)  # 小缓存
     def small_cache_func(n: int) -> int:
         """小缓存函数"""
         time.sleep(0.01)
         return n * 2
 
+    @track_lru_cache
     @lru_cache(maxsize=50)  # 大缓存
     def large_cache_func(n: int) -> int:
         """大缓存函数"""
@@ -200,6 +218,96 @@ def demo_cache_size_effects():
     print(
         f"  大缓存(50): 耗时{large_cache_time:.2f}s, 命中率{large_cache_info.hits / (large_cache_info.hits + large_cache_info.misses) * 100:.1f}%"
     )
+    untrack_lru_cache(small_cache_func, large_cache_func)
+
+
+def demo_cache_size_advisor():
+    """根据缺失率曲线选择 maxsize"""
+    print("\n\n=== 6. 缓存大小建议 (缺失率曲线) ===")
+
+    @trace_keys
+    @track_lru_cache
+    @lru_cache(maxsize=None)
+    def get_score(user_id: int) -> int:
+        """被记录访问键的函数 (这里不需要真的慢)"""
+        return user_id * 7
+
+    # 测试数据：1000 个用户, 少数用户被频繁访问
+    rng = random.Random(42)
+    weights = [1 / k for k in range(1, 1001)]
+    for user_id in rng.choices(range(1, 1001), weights=weights, k=20000):
+        get_score(user_id)
+
+    # 一次遍历得到所有 maxsize 下的命中率
+    print(get_score.report([5, 50, 100, 200, 500, 1000]))
+    target = 0.8
+    maxsize = get_score.recommend_maxsize(target)
+    print(f"命中率达到 {target:.0%} 的最小 maxsize: {maxsize}")
+
+    # 用推荐的 maxsize 实际重放一次验证 (LRU 下预测是精确的)
+    @track_lru_cache
+    @lru_cache(maxsize=maxsize)
+    def replay(user_id: int) -> int:
+        return user_id * 7
+
+    for key in get_score.trace:
+        replay(key)
+    info = replay.cache_info()
+    print(f"重放验证: {info}, 命中率{info.hits / (info.hits + info.misses) * 100:.1f}%")
+    untrack_lru_cache(get_score.func, replay)  # get_score 是 trace_keys 的包装, .func 才是登记的函数
+
+
+def demo_unhashable_parameters():
+    """不可哈希参数缓存演示"""
+    print("\n\n=== 7. 不可哈希参数缓存演示 ===")
+
+    @dataclass
+    class Cart:
+        user_id: int
+        items: list
+
+    @track_lru_cache
+    @lru_cache(maxsize=100)
+    def lru_price(cart: Cart, rules: dict) -> float:
+        return 0.0
+
+    try:
+        lru_price(Cart(1, [1, 2]), {"vip": 0.9})
+    except TypeError as e:
+        print(f"lru_cache: TypeError: {e}")
+    untrack_lru_cache(lru_price)
+
+    @structural_cache(maxsize=100)
+    def price_cart(cart: Cart, rules: dict) -> float:
+        """按内容缓存: 字段相同的 Cart、键值相同的 dict 得到同一个键"""
+        print(f"  计算价格: {cart}")
+        time.sleep(0.02)  # 模拟计算时间
+        return sum(cart.items) * rules.get("vip", 1.0)
+
+    # 每次都是新建的对象, 但内容有重复 (dict 的键顺序不同也算相同)
+    requests = [
+        (Cart(1, [10, 20]), {"vip": 0.9, "tax": 0.1}),
+        (Cart(2, [5]), {"vip": 0.9, "tax": 0.1}),
+        (Cart(1, [10, 20]), {"tax": 0.1, "vip": 0.9}),  # 重复
+        (Cart(2, [5]), {"vip": 0.9, "tax": 0.1}),  # 重复
+    ]
+    for cart, rules in requests:
+        price_cart(cart, rules)
+    stats = price_cart.cache_stats()
+    print(f"缓存统计: {price_cart.cache_info()}")
+    print(f"  算键平均 {stats['key_cost_us']:.1f}us, 计算平均 {stats['compute_cost_us']:.1f}us")
+
+    # 参数很大、函数很快: 算键比重新计算还慢, 自动绕过缓存
+    @structural_cache(maxsize=100)
+    def count_items(rows: list) -> int:
+        return len(rows)
+
+    rows = [{"id": i, "tags": ["a", "b"]} for i in range(10000)]
+    for _ in range(20):
+        count_items(rows)
+    stats = count_items.cache_stats()
+    print(f"大参数 + 快函数: 算键 {stats['key_cost_us']:.0f}us, 计算 {stats['compute_cost_us']:.1f}us, "
+          f"绕过缓存 {stats['bypassed']} 次")
 
 
 def main():
@@ -212,6 +320,8 @@ def main():
     # demo_database_query()
     # demo_complex_parameters()
     # demo_cache_size_effects()
+    # demo_cache_size_advisor()
+    # demo_unhashable_parameters()
 
     print("\n" + "=" * 50)
     print("📝 关键要点:")
@@ -221,6 +331,7 @@ def main():
     print("4. cache_info() 查看统计信息")
     print("5. cache_clear() 清理缓存")
     print("6. LRU算法自动管理内存")
+    print("7. @track_lru_cache 让 cache_metrics 导出命中/未命中计数")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+淘汰策略对比: LRU / LFU / ARC / W-TinyLFU
+========================================
+
+用 load_generator 生成和订单处理相同的用户访问序列 (get_user_info 的键), 在同样的 maxsize 下重放,
+比较命中率、缓存占用的字节数 (值 + 策略自己的元数据) 和每次访问的开销。
+
+几种访问序列:
+- zipf: 少数热门用户占大部分订单
+- zipf+scan: 同上, 每隔一段插入一批只出现一次的查询 (报表、爬虫), LRU 会被它们冲掉
+- hotspot: 10% 的用户占 90% 的访问
+- shift: 前后两半的热门用户不同, 看策略能否跟上热点变化
+
+    python policy_benchmark.py --orders 50000 --users 5000 --maxsize 100 500 2000
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Dict, List
+
+from combined_example import DataService
+from load_generator import make_orders
+from ttl_cache import TTLLRUCache
+
+POLICY_NAMES = ["lru", "lfu", "arc", "w-tinylfu"]
+
+
+def record_size(value: Dict[str, Any]) -> int:
+    """用户记录的大致字节数 (dict 本身 + 键和值)"""
+    return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+
+
+def user_trace(count: int, users: int, distribution: str, seed: int) -> List[int]:
+    return [order["user_id"] for order in make_orders(count, users, 1, distribution, seed)]
+
+
+def make_traces(count: int, users: int, seed: int = 0) -> Dict[str, List[int]]:
+    zipf = user_trace(count, users, "zipf", seed)
+
+    # 每 1000 次访问插入 300 个只出现一次的键 (不存在的用户 id, 查询结果也会被缓存)
+    scan = []
+    one_off = users + 1
+    for i, key in enumerate(zipf):
+        if i % 1000 == 0:
+            scan.extend(range(one_off, one_off + 300))
+            one_off += 300
+        scan.append(key)
+
+    shift = user_trace(count // 2, users, "zipf", seed) + user_trace(count - count // 2, users, "zipf", seed + 1)
+
+    return {
+        "zipf": zipf,
+        "zipf+scan": scan,
+        "hotspot": user_trace(count, users, "hotspot", seed),
+        "shift": shift,
+    }
+
+
+def replay(trace: List[int], policy: str, maxsize: int, users_db: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    # maxbytes 设得足够大, 只是为了让缓存统计 currbytes (值占用的字节数)
+    cache = TTLLRUCache(maxsize=maxsize, maxbytes=sys.maxsize, sizeof=record_size,
+                        single_flight=False, policy=policy)
+    missing = {"error": "用户不存在"}
+    start = time.perf_counter()
+    for key in trace:
+        hit, _ = cache.get(key)
+        if not hit:
+            cache.set(key, users_db.get(key, missing))
+    elapsed = time.perf_counter() - start
+
+    info = cache.info()
+    value_bytes = cache.currbytes
+    metadata_bytes = cache.policy.metadata_bytes() if cache.policy is not None else 0
+    hit_ratio = info.hits / len(trace)
+    return {
+        "policy": policy,
+        "maxsize": maxsize,
+        "hit_ratio": hit_ratio,
+        "value_bytes": value_bytes,
+        "metadata_bytes": metadata_bytes,
+        # 每 MB 缓存 (值 + 元数据) 换来的命中率, 用来比较"每个字节的收益"
+        "hit_ratio_per_mb": hit_ratio / ((value_bytes + metadata_bytes) / 1024 / 1024),
+        "us_per_access": elapsed / len(trace) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缓存淘汰策略对比")
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--maxsize", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--policies", nargs="+", choices=POLICY_NAMES, default=POLICY_NAMES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    users_db = DataService(user_count=args.users, product_count=1).users_db
+    traces = make_traces(args.orders, args.users, args.seed)
+
+    for name, trace in traces.items():
+        print(f"\n=== {name}: {len(trace)} 次访问, {len(set(trace))} 个不同的键 ===")
+        print(f"{'maxsize':>8}  {'policy':<10}{'hit%':>7}{'值 KB':>9}{'元数据 KB':>11}{'hit%/MB':>9}{'us/次':>8}")
+        for maxsize in args.maxsize:
+            results = [replay(trace, policy, maxsize, users_db) for policy in args.policies]
+            best = max(results, key=lambda r: r["hit_ratio"])
+            for r in results:
+                mark = " *" if r is best else ""
+                print(f"{maxsize:>8}  {r['policy']:<10}{r['hit_ratio'] * 100:>7.1f}"
+                      f"{r['value_bytes'] / 1024:>9.0f}{r['metadata_bytes'] / 1024:>11.0f}"
+                      f"{r['hit_ratio_per_mb'] * 100:>9.1f}{r['us_per_access']:>8.2f}{mark}")
+
+    print("\n* 表示该 maxsize 下命中率最高的策略")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+任务粒度对比: 调度开销什么时候超过计算本身
+======================================
+
+总计算量固定 (所有任务的 n 加起来是 --total), 把它切成不同大小的 cpu_heavy(n) 任务:
+- serial: 单进程循环
+- executor: 和 processpool_tutorial.py 一样, 新建 ProcessPoolExecutor, 每个任务 submit 一次
+- pool-chunk1: 预热好的 WorkerPool, 每块一个任务 (只省掉了创建进程)
+- pool-auto: 预热好的 WorkerPool, 自动分块 + 工作窃取
+
+任务越小, "每个任务的调度开销 / 每个任务的计算时间" 越大; 这个比值接近 1 的地方就是交叉点,
+再往下不分块的进程池会比单进程还慢。
+
+    python pool_granularity_benchmark.py --total 5000000 --sizes 100 1000 10000 100000 1000000
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List
+
+from processpool_tutorial import cpu_heavy
+from worker_pool import WorkerPool
+
+
+def run_serial(tasks: List[int]):
+    return [cpu_heavy(n) for n in tasks]
+
+
+def run_executor(tasks: List[int], processes: int):
+    with ProcessPoolExecutor(max_workers=processes) as ex:
+        futures = [ex.submit(cpu_heavy, n) for n in tasks]
+        return [f.result() for f in futures]
+
+
+def timed(func: Callable, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="进程池任务粒度对比")
+    parser.add_argument("--total", type=int, default=5_000_000, help="所有任务的 n 之和")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with WorkerPool(processes=args.processes) as pool:
+        overhead = pool.dispatch_overhead
+        print(f"{args.processes} 个进程, 一次往返调度开销 ≈ {overhead * 1e6:.0f}us\n")
+        print(f"{'n/任务':>9}{'任务数':>8}{'计算us/个':>11}{'开销/计算':>10}"
+              f"{'serial':>9}{'executor':>10}{'chunk1':>9}{'auto':>9}{'auto块数':>9}{'窃取':>6}")
+
+        for size in args.sizes:
+            tasks = [size] * max(1, args.total // size)
+            results: Dict[str, float] = {
+                "serial": timed(run_serial, tasks),
+                "executor": timed(run_executor, tasks, args.processes),
+                "chunk1": timed(pool.map, cpu_heavy, tasks, 1),
+            }
+            chunks_before, steals_before = pool.chunks_sent, pool.steals
+            results["auto"] = timed(pool.map, cpu_heavy, tasks)
+            chunks = pool.chunks_sent - chunks_before
+            steals = pool.steals - steals_before
+
+            compute = results["serial"] / len(tasks)
+            print(f"{size:>9}{len(tasks):>8}{compute * 1e6:>11.1f}{overhead / compute:>10.2f}"
+                  f"{results['serial']:>8.2f}s{results['executor']:>9.2f}s{results['chunk1']:>8.2f}s"
+                  f"{results['auto']:>8.2f}s{chunks:>9}{steals:>6}")
+
+    print("\n开销/计算 > 1 时, 不分块 (executor / chunk1) 的时间主要花在调度上; 自动分块把很多小任务打包, 开销被摊薄")
+
+
+if __name__ == "__main__":
+    main()
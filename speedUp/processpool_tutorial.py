@@ -1,10 +1,16 @@
 from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 import os
 import time
 
+from square_kernels import KERNELS
+from worker_pool import WorkerPool
 
-def cpu_heavy(n: int) -> tuple[int, float, int]:
-    s = sum(i * i for i in range(n))
+
+def cpu_heavy(n: int, kernel: str = "python") -> tuple[int, float, int]:
+    # kernel: "python" 逐个元素累加; "numpy" 分块向量化; "closed-form" 公式 (n-1)n(2n-1)/6
+    # 三种算法结果完全相同 (都是精确整数), 见 square_kernels.py
+    s = KERNELS[kernel](n)
     # getpid() 获得当前进程的 id
     return n, s**0.5, os.getpid()
 
@@ -49,3 +55,35 @@ if __name__ == "__main__":
     time_cost = end_time - start_time
     print(f"The time cost is {time_cost: .2f} s")
     print("单进程版本结束")
+
+    # 任务很多、每个任务很小时, 每个任务一次 submit 的调度开销比计算还大
+    # WorkerPool: 进程常驻 (只创建一次), 自动把小任务打包成块, 空闲进程从别的进程那里窃取任务
+    print("常驻进程池 + 自动分块运行")
+    small_nums = [1_000 + i % 100 for i in range(20_000)]
+    with WorkerPool(processes=os.cpu_count()) as pool:
+        start_time = time.perf_counter()
+        result = pool.map(cpu_heavy, small_nums)
+        time_cost = time.perf_counter() - start_time
+        print(f"{len(result)} 个小任务, 发送了 {pool.chunks_sent} 个块, 窃取 {pool.steals} 次")
+        print(f"The time cost is {time_cost: .2f} s")
+
+        # 进程池还在, 第二批任务不用再创建进程
+        start_time = time.perf_counter()
+        result = pool.map(cpu_heavy, nums)
+        time_cost = time.perf_counter() - start_time
+        print(result)
+        print(f"The time cost is {time_cost: .2f} s")
+    print("常驻进程池版本结束")
+
+    # 比并行更快的办法是少算: 同样的输入换成向量化或闭式公式
+    print("不同数值内核对比 (同一个进程池, 同样的输入)")
+    with WorkerPool(processes=os.cpu_count()) as pool:
+        expected = None
+        for kernel in KERNELS:
+            start_time = time.perf_counter()
+            result = pool.map(partial(cpu_heavy, kernel=kernel), nums)
+            time_cost = time.perf_counter() - start_time
+            sums = [(n, ans) for n, ans, _ in result]
+            expected = expected or sums
+            print(f"{kernel:>12}: The time cost is {time_cost: .4f} s, 结果一致: {sums == expected}")
+    print("数值内核对比结束")
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+参数不可哈希时的缓存: 结构化键
+============================
+
+lru_cache 要求参数可哈希, 传 dict / list / NumPy 数组 / 普通 dataclass 会直接 TypeError。
+structural_key 按内容生成稳定的键 (与对象地址、dict 插入顺序无关, 跨进程也一样, 可以配合 SQLiteStore 持久化):
+- None / bool / int / float / str: JSON 文本
+- list / tuple / dict / set: 带类型标记的规范文本, dict 和 set 的元素排序后再拼接
+- dataclass: 类名 + 各字段; 其他有 __dict__ 的对象: 类名 + 属性
+- NumPy 数组: dtype + shape + 数据的 blake2b 摘要 (不把整个数组放进键里); dtype=object 的数组逐个元素编码
+- 函数 / lambda / 模块等: TypeError (它们的行为不在属性里, 按属性生成的键会把不同的回调当成同一个)
+整段文本再做一次 blake2b, 缓存里的键固定 16 字节。
+
+生成键本身也有开销: 参数很大、函数又很快时, 算键可能比重新计算还慢。
+structural_cache 记录算键和计算的平均耗时, 算键更贵时自动绕过缓存直接调用函数,
+每隔 recheck_every 次调用重新测一次, 参数变小以后会恢复缓存。
+
+    @structural_cache(maxsize=128)
+    def price_cart(cart: dict, rules: list) -> float: ...
+"""
+
+import dataclasses
+import enum
+import hashlib
+import json
+import threading
+import time
+import types
+from functools import update_wrapper
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from ttl_cache import CacheInfo, TTLLRUCache, make_key
+
+try:
+    import numpy as np
+except ImportError:  # 没有安装 numpy 时不支持数组参数
+    np = None
+
+_PRIMITIVES = (type(None), bool, int, float, str)
+
+
+def _encode(obj: Any, parts: List[str]):
+    """把 obj 的规范文本追加到 parts; 不支持循环引用"""
+    if type(obj) in _PRIMITIVES:
+        parts.append(json.dumps(obj))
+    elif isinstance(obj, enum.Enum):
+        # 成员由类和名字确定; vars() 里有 __objclass__ 等可调用对象, 也不能按属性编码
+        parts.append(f"{type(obj).__qualname__}.{obj.name}")
+    elif isinstance(obj, (bytes, bytearray)):
+        parts.append("b" + obj.hex())
+    elif isinstance(obj, (list, tuple)):
+        parts.append("[" if isinstance(obj, list) else "(")
+        for item in obj:
+            _encode(item, parts)
+            parts.append(",")
+        parts.append("]" if isinstance(obj, list) else ")")
+    elif isinstance(obj, dict):
+        items = []
+        for k, v in obj.items():
+            item_parts: List[str] = []
+            _encode(k, item_parts)
+            item_parts.append(":")
+            _encode(v, item_parts)
+            items.append("".join(item_parts))
+        parts.append("{" + ",".join(sorted(items)) + "}")
+    elif isinstance(obj, (set, frozenset)):
+        parts.append("<" + ",".join(sorted(structural_text(item) for item in obj)) + ">")
+    elif np is not None and isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            # 缓冲区里是对象指针, 内容相同的数组指针也不同, 只能逐个元素编码
+            parts.append(f"ndarray({obj.dtype.str},{obj.shape},")
+            _encode(obj.tolist(), parts)
+            parts.append(")")
+        else:
+            digest = hashlib.blake2b(np.ascontiguousarray(obj).data, digest_size=16).hexdigest()
+            parts.append(f"ndarray({obj.dtype.str},{obj.shape},{digest})")
+    elif np is not None and isinstance(obj, np.generic):
+        parts.append(f"{obj.dtype.str}:{obj.item()!r}")
+    elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        parts.append(type(obj).__qualname__ + "(")
+        for field in dataclasses.fields(obj):
+            parts.append(field.name + "=")
+            _encode(getattr(obj, field.name), parts)
+            parts.append(",")
+        parts.append(")")
+    elif callable(obj) or isinstance(obj, types.ModuleType):
+        raise TypeError(f"{type(obj).__name__} 不能作为结构化键: 行为不由属性决定, 请改传可以比较内容的参数")
+    elif hasattr(obj, "__dict__"):
+        parts.append(type(obj).__qualname__)
+        _encode(vars(obj), parts)
+    else:
+        raise TypeError(f"无法为 {type(obj).__name__} 生成结构化键")
+
+
+def structural_text(obj: Any) -> str:
+    """obj 的规范文本: 内容相同的对象得到相同的文本"""
+    parts: List[str] = []
+    _encode(obj, parts)
+    return "".join(parts)
+
+
+def structural_key(args: Tuple, kwargs: Dict[str, Any]) -> Hashable:
+    """参数都是简单类型时与 ttl_cache.make_key 相同; 否则返回规范文本的 16 字节摘要
+
+    make_key 只会返回 int / str / tuple, 不会与 bytes 摘要冲突。
+    """
+    if all(type(a) in _PRIMITIVES for a in args) and all(type(v) in _PRIMITIVES for v in kwargs.values()):
+        return make_key(args, kwargs)
+    text = structural_text((args, sorted(kwargs.items())))
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class StructuralCachedFunction:
+    """被缓存的函数: 用 structural_key 生成键, 算键比重新计算还慢时绕过缓存"""
+
+    def __init__(
+        self,
+        func: Callable,
+        cache: TTLLRUCache,
+        max_key_cost_ratio: float = 1.0,
+        min_samples: int = 5,
+        recheck_every: int = 100,
+    ):
+        self.__wrapped__ = func
+        self.cache = cache
+        self.max_key_cost_ratio = max_key_cost_ratio
+        self.min_samples = min_samples
+        self.recheck_every = recheck_every
+
+        self.key_cost = 0.0  # 算键的平均耗时 (秒, 指数移动平均)
+        self.compute_cost = 0.0  # 真正调用函数的平均耗时
+        self.key_samples = 0
+        self.compute_samples = 0
+        self.calls = 0
+        self.bypassed = 0
+        self.bypassing = False
+        self._lock = threading.Lock()
+        update_wrapper(self, func)
+
+    @staticmethod
+    def _average(current: float, samples: int, value: float) -> float:
+        # 前几次取算术平均, 之后用指数移动平均跟上参数大小的变化
+        return current + (value - current) / min(samples, 20)
+
+    def _compute(self, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        value = self.__wrapped__(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.compute_samples += 1
+            self.compute_cost = self._average(self.compute_cost, self.compute_samples, elapsed)
+        return value
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            bypass = self.bypassing and self.calls % self.recheck_every != 0
+            if bypass:
+                self.bypassed += 1
+        if bypass:
+            return self._compute(args, kwargs)
+
+        start = time.perf_counter()
+        key = structural_key(args, kwargs)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.key_samples += 1
+            self.key_cost = self._average(self.key_cost, self.key_samples, elapsed)
+            # 命中率高时很少真正计算, 有一次计算的耗时就可以比较
+            if self.key_samples >= self.min_samples and self.compute_samples:
+                self.bypassing = self.key_cost > self.compute_cost * self.max_key_cost_ratio
+
+        return self.cache.get_or_load(key, lambda: self._compute(args, kwargs))
+
+    def invalidate(self, *args, **kwargs) -> bool:
+        return self.cache.invalidate(structural_key(args, kwargs))
+
+    def cache_info(self) -> CacheInfo:
+        return self.cache.info()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        with self._lock:
+            stats.update({
+                "key_cost_us": self.key_cost * 1e6,
+                "compute_cost_us": self.compute_cost * 1e6,
+                "bypassed": self.bypassed,
+                "bypassing": self.bypassing,
+            })
+        return stats
+
+    def cache_clear(self):
+        self.cache.clear()
+        with self._lock:
+            self.key_cost = self.compute_cost = 0.0
+            self.key_samples = self.compute_samples = self.calls = self.bypassed = 0
+            self.bypassing = False
+
+
+def structural_cache(
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
+    max_key_cost_ratio: float = 1.0,
+    min_samples: int = 5,
+    recheck_every: int = 100,
+    **cache_kwargs,
+):
+    """
+    @structural_cache(maxsize=128, ttl=60)
+    def score(user: dict, features: np.ndarray): ...
+
+    算键的平均耗时超过 max_key_cost_ratio x 计算的平均耗时 (至少算过 min_samples 次键之后) 就绕过缓存;
+    其余参数 (maxbytes / store / policy ...) 原样传给 TTLLRUCache。
+    用于普通函数 (方法请用 ttl_lru_cache, 或者把需要的属性作为参数传进来)。
+    """
+
+    def decorator(func: Callable) -> StructuralCachedFunction:
+        cache = TTLLRUCache(maxsize=maxsize, ttl=ttl, namespace=func.__qualname__, **cache_kwargs)
+        return StructuralCachedFunction(func, cache, max_key_cost_ratio, min_samples, recheck_every)
+
+    return decorator
@@ -10,6 +10,9 @@ import time
 import threading
 import concurrent.futures
 import random
+import tracemalloc
+
+from bounded_executor import StreamStats, bounded_as_completed, bounded_map, imap, imap_unordered
 
 
 def demo_basic_usage():
@@ -56,12 +59,8 @@ def demo_as_completed():
     print("按完成顺序收集结果:")
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-        # 任务映射字典
-        future_to_id = {executor.submit(random_task, i): i for i in range(1, 6)}
-
-        # .as_completed() 按完成顺序返回结果 (完成一个就返回一个)
-        for future in concurrent.futures.as_completed(future_to_id):
-            task_id = future_to_id[future]
+        # 有界提交: 同时最多 4 个任务在途 (少于 5 个输入, 多于 3 个线程), 完成一个再提交一个; 按完成顺序返回 (输入, future)
+        for task_id, future in bounded_as_completed(executor, random_task, range(1, 6), max_in_flight=4):
             result = future.result()
             print(f"  收到: {result}")
 
@@ -80,10 +79,8 @@ def demo_error_handling():
     failed = []
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-        future_to_id = {executor.submit(unreliable_task, i): i for i in range(1, 8)}
-
-        for future in concurrent.futures.as_completed(future_to_id):
-            task_id = future_to_id[future]
+        # 有界提交: 同时最多 4 个任务在途, 输入再多内存也不会增长 (见 demo_bounded_submission)
+        for task_id, future in bounded_as_completed(executor, unreliable_task, range(1, 8), max_in_flight=4):
             try:
                 result = future.result()
                 successful.append(result)
@@ -117,6 +114,70 @@ def as_completed_demo():
             print("结果:", result.result())
 
 
+def demo_bounded_submission():
+    """有界提交演示: 先全部 submit vs 控制在途任务数"""
+    print("\n\n=== 4. 有界提交演示 ===")
+
+    def tiny_task(x: int) -> int:
+        return x * 2
+
+    count = 50_000
+
+    # 先全部 submit: count 个 Future 和参数同时留在内存里
+    tracemalloc.start()
+    start = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(tiny_task, i) for i in range(count)]
+        total = sum(future.result() for future in concurrent.futures.as_completed(futures))
+    _, unbounded_peak = tracemalloc.get_traced_memory()
+    unbounded_time = time.time() - start
+    tracemalloc.stop()
+    del futures
+
+    # 有界提交: 同一时刻最多 64 个任务在途, 输入用生成器按需读取
+    tracemalloc.start()
+    start = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        bounded_total = sum(future.result() for _, future in
+                            bounded_as_completed(executor, tiny_task, range(count), max_in_flight=64))
+        # 需要按输入顺序拿结果时用 bounded_map
+        ordered = list(bounded_map(executor, tiny_task, range(10), max_in_flight=4))
+    _, bounded_peak = tracemalloc.get_traced_memory()
+    bounded_time = time.time() - start
+    tracemalloc.stop()
+
+    print(f"{count} 个任务:")
+    print(f"  全部 submit: 峰值内存 {unbounded_peak / 1024 / 1024:.1f} MB, 耗时 {unbounded_time:.2f}秒")
+    print(f"  有界提交:    峰值内存 {bounded_peak / 1024 / 1024:.1f} MB, 耗时 {bounded_time:.2f}秒")
+    print(f"  结果相同: {total == bounded_total}, bounded_map 按顺序: {ordered}")
+
+
+def straggler_task(x):
+    time.sleep(0.5 if x % 10 == 0 else 0.02)  # 每 10 个任务有一个慢任务
+    return x
+
+
+def imap_demo():
+    """ex.map 要等队首的慢任务; as_completed 丢了顺序; imap 按顺序尽早产出, 慢任务期间继续处理后面的任务"""
+    inputs = list(range(40))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as ex:
+        start = time.time()
+        list(bounded_map(ex, straggler_task, inputs, max_in_flight=4))
+        print(f"  bounded_map (等队首时不再提交): {time.time() - start:.2f}秒")
+
+        stats = StreamStats()
+        start = time.time()
+        results = list(imap(ex, straggler_task, inputs, max_in_flight=4, max_buffer=16, stats=stats))
+        print(f"  imap (并发 4, 多提交 16 个):   {time.time() - start:.2f}秒, 顺序正确: {results == inputs}")
+        print(f"    队头阻塞 {stats.head_of_line_seconds:.2f}秒, 最多 {stats.max_buffered} 个结果在等前面的任务, "
+              f"结果平均晚产出 {stats.reorder_delay_mean * 1000:.0f}ms")
+
+        stats = StreamStats()
+        start = time.time()
+        list(imap_unordered(ex, straggler_task, inputs, max_in_flight=4, stats=stats))
+        print(f"  imap_unordered:                {time.time() - start:.2f}秒, 队头阻塞 {stats.head_of_line_seconds:.2f}秒")
+
+
 def main():
     """运行所有演示"""
     print("🧵 线程池 (ThreadPoolExecutor) 教程")
@@ -125,11 +186,14 @@ def main():
     # demo_basic_usage()
     # demo_as_completed()
     # demo_error_handling()
+    # demo_bounded_submission()
     # demo_practical_example()
     print("=== map 演示 ===")
     map_demo()
     print("=== as_completed 演示 ===")
     as_completed_demo()
+    print("=== imap 演示 ===")
+    imap_demo()
 
     print("\n" + "=" * 50)
 
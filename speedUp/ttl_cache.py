@@ -0,0 +1,687 @@
+# -*- coding: utf-8 -*-
+"""
+TTL + LRU 缓存装饰器
+====================
+
+functools.lru_cache 用在方法上有几个问题:
+- 缓存挂在类上, 以 self 为键的一部分, 实例用完也不会被释放
+- 没有过期时间, 数据库里的数据改了, 缓存还一直返回旧值
+- 只能整体 cache_clear(), 不能只让某一个键失效
+
+ttl_lru_cache 解决这些问题:
+- ttl: 每个条目的存活时间 (秒), 过期后下次访问重新计算
+- maxsize / maxbytes: 按条目数或按估算的字节数做 LRU 淘汰
+- 用在方法上时每个实例有自己的缓存 (per_instance=True), 实例释放时缓存一起释放
+- cache_info() 与 lru_cache 兼容, 另外 cache_stats() 给出过期/淘汰次数
+- invalidate(*args, **kwargs): 用和调用时相同的参数让单个键失效
+- 线程安全: 内部用锁保护缓存结构, 被缓存的函数本身在锁外执行
+- single_flight: 多个线程同时未命中同一个键时只有第一个去计算, 其余线程等它的结果
+- 也可以装饰 async def: 缓存的是 await 之后的结果 (lru_cache 缓存的是协程对象, 第二次 await 会报错),
+  并发未命中的协程共同等待同一个加载任务
+- store: 第二层持久化存储 (见 disk_cache.SQLiteStore), 内存未命中时查磁盘, 新建缓存时从磁盘预热
+- policy: 淘汰策略, 默认 LRU; 也可以用 "lfu" / "arc" / "w-tinylfu" (见 eviction_policies.py)
+- 每个缓存自动登记到 cache_metrics, 可以导出 Prometheus 文本或 JSON 快照 (含加载耗时直方图)
+"""
+
+import ast
+import asyncio
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import partial, update_wrapper
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from cache_metrics import LatencyHistogram, register_cache
+from eviction_policies import make_policy
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+class _KwdMark:
+    """分隔位置参数和关键字参数, 与 lru_cache 的做法一致; repr 固定, 持久化时键的文本形式不变"""
+
+    def __repr__(self):
+        return "<kwd>"
+
+
+_KWD_MARK = _KwdMark()
+
+
+class _Flight:
+    """一次正在进行的计算: 等待者阻塞在 event 上, 拿到同一个结果 (或同一个异常)"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+    def resolve(self, value: Any):
+        self.value = value
+        self.event.set()
+
+    def fail(self, error: BaseException):
+        self.error = error
+        self.event.set()
+
+    def wait(self) -> Any:
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def _copy_result(task: asyncio.Task, waiter: asyncio.Future):
+    if waiter.cancelled():
+        return
+    if task.cancelled():
+        waiter.cancel()
+    elif task.exception() is not None:
+        waiter.set_exception(task.exception())
+    else:
+        waiter.set_result(task.result())
+
+
+def make_key(args: Tuple, kwargs: Dict[str, Any]) -> Hashable:
+    """f(1, b=2) 和 f(1, 2) 是不同的键, 与 lru_cache 相同"""
+    if not kwargs:
+        return args[0] if len(args) == 1 and type(args[0]) in (int, str) else args
+    return args + (_KWD_MARK,) + tuple(sorted(kwargs.items()))
+
+
+class TTLLRUCache:
+    """线程安全的 TTL + LRU 缓存 (不含装饰器逻辑, 也可以单独使用)"""
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = 128,
+        ttl: Optional[float] = None,
+        maxbytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+        single_flight: bool = True,
+        store: Any = None,
+        namespace: str = "",
+        warm_start: bool = True,
+        policy: Optional[str] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.single_flight = single_flight
+        self.store = store  # 第二层存储: get / put / delete / clear / recent, 键是 repr(key)
+        self.namespace = namespace
+        # None 表示内置 LRU (_data 的顺序); 其他策略自己记录淘汰顺序, _data 只存值
+        self.policy = make_policy(policy, maxsize)
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.coalesced = 0  # 等待别人的计算结果、省掉的重复计算次数
+        self.store_hits = 0  # 内存未命中、从第二层存储取到的次数 (也计入 hits)
+        self.warmed = 0  # 预热时从第二层存储载入的条目数
+        self.currbytes = 0
+        self.load_latency = LatencyHistogram()  # 未命中时真正调用函数的耗时
+
+        # key -> (value, 过期时间, 字节数); OrderedDict 的顺序就是 LRU 顺序, 末尾最新
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._async_flights: Dict[Hashable, asyncio.Task] = {}
+        # 正在加载的键 -> [加载中的调用数, 代数]; invalidate 让代数加一, 加载完发现代数变了就不写缓存
+        self._loads: Dict[Hashable, List[int]] = {}
+
+        self.metrics = register_cache(self)  # 按函数累计、不会被 clear() 清零的计数, 用于导出
+        if store is not None and warm_start:
+            self.warm_start()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """返回 (是否命中, 值)"""
+        with self._lock:
+            hit, value = self._lookup(key)
+        if hit:
+            return True, value
+        return self._lookup_store(key)
+
+    async def get_async(self, key: Hashable) -> Tuple[bool, Any]:
+        """get 的协程版本: 第二层存储的读取放到线程里, 不阻塞事件循环"""
+        with self._lock:
+            hit, value = self._lookup(key)
+        if hit:
+            return True, value
+        if self.store is None:
+            return self._lookup_store(key)
+        return await asyncio.to_thread(self._lookup_store, key)
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """只查内存, 未命中时不计数 (由 _lookup_store 计); 调用者持有 self._lock"""
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            if expires_at > time.monotonic():
+                if self.policy is None:
+                    self._data.move_to_end(key)
+                else:
+                    self.policy.access(key)
+                self.hits += 1
+                self.metrics.add("hits")
+                return True, value
+            self._remove(key)
+            self.expirations += 1
+            self.metrics.add("expirations")
+        if self.policy is not None:
+            self.policy.miss(key)
+        return False, None
+
+    def _lookup_store(self, key: Hashable) -> Tuple[bool, Any]:
+        """内存未命中之后查第二层存储, 都没有才记一次未命中; 调用者不持有锁,
+        磁盘读取期间其他线程的查询 (包括内存命中) 不用排队等它"""
+        if self.store is None:
+            with self._lock:
+                self._record_miss()
+            return False, None
+
+        with self._lock:
+            generation = self._begin_load(key)
+        try:
+            found, value, expires_at = self.store.get(self.namespace, repr(key))
+            with self._lock:
+                # 读取期间被 invalidate 过, 读到的可能是旧值, 当作未命中
+                if not found or self._loads[key][1] != generation:
+                    self._record_miss()
+                    return False, None
+                self._insert(key, value, self._monotonic_expiry(expires_at))
+                self.hits += 1
+                self.store_hits += 1
+                self.metrics.add("hits")
+                self.metrics.add("store_hits")
+                return True, value
+        finally:
+            self._end_load(key)
+
+    def _record_miss(self):
+        self.misses += 1
+        self.metrics.add("misses")
+
+    # ---------- 第二层存储 ----------
+
+    @staticmethod
+    def _monotonic_expiry(wall_expires_at: Optional[float]) -> float:
+        """磁盘上存的是墙上时间, 内存里用 monotonic"""
+        if wall_expires_at is None:
+            return float("inf")
+        return time.monotonic() + (wall_expires_at - time.time())
+
+    def warm_start(self):
+        """从第二层存储载入最近写入的 maxsize 个条目, 重启后不用从零开始命中"""
+        with self._lock:
+            for key_text, value, expires_at in self.store.recent(self.namespace, self.maxsize):
+                try:
+                    key = ast.literal_eval(key_text)
+                except (ValueError, SyntaxError):
+                    continue  # 带关键字参数等无法还原的键, 之后访问时再从磁盘读
+                self._insert(key, value, self._monotonic_expiry(expires_at))
+                self.warmed += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """未命中时调用 loader() 计算并缓存; single_flight 时同一个键同一时刻只计算一次"""
+        if not self.single_flight:
+            hit, value = self.get(key)
+            if hit:
+                return value
+            with self._lock:
+                generation = self._begin_load(key)
+            try:
+                value = self._timed_load(loader)
+                self._set_loaded(key, value, generation)
+            finally:
+                self._end_load(key)
+            return value
+
+        with self._lock:
+            hit, value = self._lookup(key)
+            if hit:
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._begin_load(key)
+            else:
+                self.coalesced += 1
+                self.metrics.add("coalesced")
+                self._record_miss()
+        if not leader:
+            return flight.wait()
+
+        try:
+            # 第二层存储也只由领头的调用者读一次, 在锁外进行
+            hit, value = self._lookup_store(key)
+            if not hit:
+                value = self._timed_load(loader)
+                # 先放进缓存再移除 flight, 中间不会有新的调用者两边都找不到而重复计算
+                self._set_loaded(key, value, generation)
+        except BaseException as e:
+            # 加载或写入第二层存储出错: flight 也必须移除并通知等待者, 否则之后的调用者会一直等
+            with self._lock:
+                del self._flights[key]
+                self._end_load(key)
+            flight.fail(e)
+            raise
+        with self._lock:
+            del self._flights[key]
+            self._end_load(key)
+        flight.resolve(value)
+        return value
+
+    async def get_or_load_async(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """get_or_load 的协程版本: 加载放在独立的任务里, 某个等待者被取消不会影响其他等待者"""
+        if not self.single_flight:
+            hit, value = await self.get_async(key)
+            if hit:
+                return value
+            with self._lock:
+                generation = self._begin_load(key)
+            try:
+                value = await self._timed_load_async(loader)
+                self._set_loaded(key, value, generation)
+            finally:
+                self._end_load(key)
+            return value
+
+        with self._lock:
+            hit, value = self._lookup(key)
+            if hit:
+                return value
+            task = self._async_flights.get(key)
+            if task is None:
+                task = asyncio.ensure_future(
+                    self._load_async(key, loader, self._begin_load(key))
+                )
+                self._async_flights[key] = task
+            else:
+                self.coalesced += 1
+                self.metrics.add("coalesced")
+                self._record_miss()
+
+        # 每个等待者有自己的 future, 被取消时只取消自己的; 不用 asyncio.shield,
+        # 它在等待者结束时要从共享任务的回调列表里线性删除, 上万个等待者时是 O(n^2)
+        waiter = asyncio.get_running_loop().create_future()
+        task.add_done_callback(partial(_copy_result, waiter=waiter))
+        return await waiter
+
+    async def _load_async(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]], generation: int
+    ) -> Any:
+        try:
+            if self.store is None:
+                hit, value = self._lookup_store(key)
+            else:
+                hit, value = await asyncio.to_thread(self._lookup_store, key)
+            if not hit:
+                value = await self._timed_load_async(loader)
+                self._set_loaded(key, value, generation)
+            return value
+        finally:
+            with self._lock:
+                del self._async_flights[key]
+                self._end_load(key)
+
+    def _begin_load(self, key: Hashable) -> int:
+        """登记一次加载, 返回当前代数; 调用者持有 self._lock"""
+        load = self._loads.setdefault(key, [0, 0])
+        load[0] += 1
+        return load[1]
+
+    def _end_load(self, key: Hashable):
+        with self._lock:
+            load = self._loads[key]
+            load[0] -= 1
+            if not load[0]:
+                del self._loads[key]
+
+    def _set_loaded(self, key: Hashable, value: Any, generation: int):
+        """写入加载结果; 加载期间键被 invalidate 过就不写, 否则会把更新前读到的值放回缓存"""
+        with self._lock:
+            if self._loads[key][1] != generation:
+                return
+        self.set(key, value)
+        with self._lock:
+            stale = self._loads[key][1] != generation
+        if stale:
+            self.invalidate(key)  # 写入的同时被 invalidate: 可能已经写到磁盘上, 再删一次
+
+    def _timed_load(self, loader: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        value = loader()
+        self.record_load(time.perf_counter() - start)
+        return value
+
+    async def _timed_load_async(self, loader: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        value = await loader()
+        self.record_load(time.perf_counter() - start)
+        return value
+
+    def record_load(self, seconds: float, times: int = 1):
+        """记录加载耗时: 本缓存的直方图 (clear() 时清零) 和函数的累计直方图"""
+        self.load_latency.observe(seconds, times)
+        self.metrics.load_latency.observe(seconds, times)
+
+    def set(self, key: Hashable, value: Any):
+        if self.ttl is not None:
+            expires_at = time.monotonic() + self.ttl
+            wall_expires_at = time.time() + self.ttl
+        else:
+            expires_at = float("inf")
+            wall_expires_at = None
+
+        with self._lock:
+            cached = self._insert(key, value, expires_at)
+        if self.store is not None:
+            if cached:
+                self.store.put(self.namespace, repr(key), value, wall_expires_at)
+            else:
+                self.store.delete(self.namespace, repr(key))  # 磁盘上的旧值也不能再返回
+
+    def _insert(self, key: Hashable, value: Any, expires_at: float) -> bool:
+        """只写内存; 调用者持有 self._lock。值太大不缓存时返回 False"""
+        if self.maxsize == 0:
+            return True
+        if key in self._data:
+            self._remove(key)  # 新值即使不缓存, 旧值也已经过时
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            return False  # 单个值比整个缓存还大, 不缓存
+        self._data[key] = (value, expires_at, size)
+        self.currbytes += size
+        if self.policy is not None:
+            self.policy.insert(key)
+        self._evict()
+        return True
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            load = self._loads.get(key)
+            if load is not None:
+                load[1] += 1  # 先于删除磁盘行, 正在加载的调用者写完磁盘后能发现并删掉
+        if self.store is not None:
+            self.store.delete(self.namespace, repr(key))
+        with self._lock:
+            if key not in self._data:
+                return False
+            self._remove(key)
+            self.invalidations += 1
+            self.metrics.add("invalidations")
+            return True
+
+    def clear(self):
+        if self.store is not None:
+            self.store.clear(self.namespace)
+        with self._lock:
+            self._data.clear()
+            if self.policy is not None:
+                self.policy.clear()
+            self.currbytes = 0
+            self.hits = self.misses = 0
+            self.expirations = self.evictions = self.invalidations = 0
+            self.coalesced = self.store_hits = self.warmed = 0
+        self.load_latency.reset()
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._data.pop(key)
+        self.currbytes -= size
+        if self.policy is not None:
+            self.policy.remove(key)
+
+    def _evict(self):
+        while self._data and (
+            (self.maxsize is not None and len(self._data) > self.maxsize)
+            or (self.maxbytes is not None and self.currbytes > self.maxbytes)
+        ):
+            if self.policy is None:
+                _, (_, _, size) = self._data.popitem(last=False)
+            else:
+                _, _, size = self._data.pop(self.policy.evict())
+            self.currbytes -= size
+            self.evictions += 1
+            self.metrics.add("evictions")
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "coalesced": self.coalesced,
+                "store_hits": self.store_hits,
+                "warmed": self.warmed,
+                "currsize": len(self._data),
+                "currbytes": self.currbytes,
+                "maxsize": self.maxsize,
+                "maxbytes": self.maxbytes,
+                "ttl": self.ttl,
+                "policy": "lru" if self.policy is None else self.policy.name,
+            }
+
+
+class _CachedFunction:
+    """被缓存的函数 (或已绑定实例的方法), 提供 cache_info / cache_clear / invalidate"""
+
+    def __init__(self, func: Callable, cache: TTLLRUCache, instance: Any = None):
+        self.__wrapped__ = func
+        self.cache = cache
+        self.instance = instance
+        update_wrapper(self, func)
+
+    def _call_args(self, args: Tuple) -> Tuple:
+        return args if self.instance is None else (self.instance,) + args
+
+    def __call__(self, *args, **kwargs):
+        return self.cache.get_or_load(
+            make_key(args, kwargs),
+            lambda: self.__wrapped__(*self._call_args(args), **kwargs),
+        )
+
+    def get_many(
+        self,
+        arg_tuples: Iterable[Tuple],
+        loader_many: Callable[[List[Tuple]], Dict[Tuple, Any]],
+    ) -> Dict[Tuple, Any]:
+        """批量查询: arg_tuples 是多组位置参数, 命中的直接返回, 未命中的一次性交给 loader_many
+
+        loader_many(missing) 返回 {参数元组: 结果}, 结果按单次调用相同的键放进缓存,
+        之后再单独调用 f(*args) 也能命中。返回 {参数元组: 结果}。
+        """
+        results: Dict[Tuple, Any] = {}
+        missing: List[Tuple] = []
+        for args in dict.fromkeys(arg_tuples):  # 去重, 保持顺序
+            hit, value = self.cache.get(make_key(args, {}))
+            if hit:
+                results[args] = value
+            else:
+                missing.append(args)
+
+        if missing:
+            start = time.perf_counter()
+            loaded = loader_many(missing)
+            # 批量加载按每个键平均的耗时计入直方图
+            self.cache.record_load((time.perf_counter() - start) / len(missing), len(missing))
+            for args in missing:
+                self.cache.set(make_key(args, {}), loaded[args])
+            results.update(loaded)
+        return results
+
+    def invalidate(self, *args, **kwargs) -> bool:
+        """用与调用时相同的参数让这一个键失效, 返回这个键之前是否在缓存里"""
+        return self.cache.invalidate(make_key(args, kwargs))
+
+    def cache_info(self) -> CacheInfo:
+        return self.cache.info()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+    def cache_clear(self):
+        self.cache.clear()
+
+
+class _AsyncCachedFunction(_CachedFunction):
+    """被缓存的 async 函数: 调用返回协程, 缓存 await 之后的结果"""
+
+    async def __call__(self, *args, **kwargs):
+        return await self.cache.get_or_load_async(
+            make_key(args, kwargs),
+            lambda: self.__wrapped__(*self._call_args(args), **kwargs),
+        )
+
+    async def get_many(
+        self,
+        arg_tuples: Iterable[Tuple],
+        loader_many: Callable[[List[Tuple]], Awaitable[Dict[Tuple, Any]]],
+    ) -> Dict[Tuple, Any]:
+        """与 _CachedFunction.get_many 相同, loader_many 是协程函数"""
+        results: Dict[Tuple, Any] = {}
+        missing: List[Tuple] = []
+        for args in dict.fromkeys(arg_tuples):
+            hit, value = await self.cache.get_async(make_key(args, {}))
+            if hit:
+                results[args] = value
+            else:
+                missing.append(args)
+
+        if missing:
+            start = time.perf_counter()
+            loaded = await loader_many(missing)
+            self.cache.record_load((time.perf_counter() - start) / len(missing), len(missing))
+            for args in missing:
+                self.cache.set(make_key(args, {}), loaded[args])
+            results.update(loaded)
+        return results
+
+
+class _CachedMethod:
+    """装饰器返回的描述符: 作为普通函数调用时共用一个缓存, 作为方法访问时每个实例一个缓存"""
+
+    def __init__(self, func: Callable, per_instance: bool, cache_kwargs: Dict[str, Any]):
+        self.func = func
+        self.per_instance = per_instance
+        self.cache_kwargs = cache_kwargs
+        self.attrname = func.__name__
+        self.bound_cls = (
+            _AsyncCachedFunction if inspect.iscoroutinefunction(func) else _CachedFunction
+        )
+        # 普通函数, 或者 per_instance=False 时所有实例共用的缓存
+        self.shared = self.bound_cls(func, self.make_cache())
+        update_wrapper(self, func)
+
+    def __set_name__(self, owner, name):
+        self.attrname = name
+
+    def make_cache(self, instance: Any = None) -> TTLLRUCache:
+        kwargs = dict(self.cache_kwargs)
+        store = kwargs.pop("store")
+        if isinstance(store, str):
+            # 字符串表示实例属性名: 存储对象在创建实例时才确定 (普通函数调用时没有实例, 不使用存储)
+            store = getattr(instance, store, None) if instance is not None else None
+        return TTLLRUCache(**kwargs, store=store, namespace=self.func.__qualname__)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if not self.per_instance:
+            return _SharedBound(self.shared, instance)
+
+        # 非数据描述符: 第一次访问后绑定对象放进实例 __dict__, 之后直接从实例上取到
+        bound = self.bound_cls(self.func, self.make_cache(instance), instance)
+        return instance.__dict__.setdefault(self.attrname, bound)
+
+    def __call__(self, *args, **kwargs):
+        return self.shared(*args, **kwargs)
+
+    def get_many(self, arg_tuples, loader_many):
+        return self.shared.get_many(arg_tuples, loader_many)
+
+    def invalidate(self, *args, **kwargs) -> bool:
+        return self.shared.invalidate(*args, **kwargs)
+
+    def cache_info(self) -> CacheInfo:
+        return self.shared.cache_info()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.shared.cache_stats()
+
+    def cache_clear(self):
+        self.shared.cache_clear()
+
+
+class _SharedBound:
+    """per_instance=False: 所有实例共用一个缓存, 和 lru_cache 一样把 self 放进键里"""
+
+    def __init__(self, cached: _CachedFunction, instance: Any):
+        self.cached = cached
+        self.instance = instance
+
+    def __call__(self, *args, **kwargs):
+        return self.cached(self.instance, *args, **kwargs)
+
+    def invalidate(self, *args, **kwargs) -> bool:
+        return self.cached.invalidate(self.instance, *args, **kwargs)
+
+    def cache_info(self) -> CacheInfo:
+        return self.cached.cache_info()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cached.cache_stats()
+
+    def cache_clear(self):
+        self.cached.cache_clear()
+
+
+def ttl_lru_cache(
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
+    maxbytes: Optional[int] = None,
+    sizeof: Callable[[Any], int] = sys.getsizeof,
+    per_instance: bool = True,
+    single_flight: bool = True,
+    store: Any = None,
+    warm_start: bool = True,
+    policy: Optional[str] = None,
+):
+    """
+    @ttl_lru_cache(maxsize=128, ttl=60)
+    def get_user_info(self, user_id): ...
+
+    maxsize=None 表示不限条目数; maxbytes 按 sizeof(value) 的累计值限制总大小
+    (默认 sys.getsizeof 只算对象本身, 嵌套结构可以传入自己的估算函数)
+    single_flight=False 时并发未命中会各自计算, 与 lru_cache 行为相同
+    store: 第二层存储对象 (disk_cache.SQLiteStore), 或者实例属性名 (例如 "cache_store"),
+    后者让每个实例在 __init__ 里决定用哪个存储; 同一个函数的条目以 __qualname__ 为命名空间
+    policy: None (LRU) / "lfu" / "arc" / "w-tinylfu", 每个缓存 (每个实例) 有自己的策略状态
+    """
+    cache_kwargs = {
+        "maxsize": maxsize,
+        "ttl": ttl,
+        "maxbytes": maxbytes,
+        "sizeof": sizeof,
+        "single_flight": single_flight,
+        "store": store,
+        "warm_start": warm_start,
+        "policy": policy,
+    }
+
+    def decorator(func: Callable) -> _CachedMethod:
+        return _CachedMethod(func, per_instance, cache_kwargs)
+
+    return decorator
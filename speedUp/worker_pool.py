@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+常驻、预热的进程池: 自动分块 + 工作窃取
+====================================
+
+processpool_tutorial.py 每次都新建 ProcessPoolExecutor, 每个 cpu_heavy(n) 一个任务。
+任务很多、每个任务很小时, 创建进程和每个任务的序列化/进程间通信反而成了大头。
+
+WorkerPool:
+- 进程只创建一次, 创建时等所有进程就绪 (执行完 initializer), 并测出一次往返的调度开销
+- map / imap_unordered 把任务打包成块 (chunk) 发送; chunksize=None 时自动选择:
+  按已完成的块估计单个任务耗时, 让一块的计算时间约为 target_chunk_time (远大于调度开销),
+  剩余任务少时块也变小, 最后不会剩一个大块让其他进程干等
+- 工作窃取: 每个进程先分到连续的一段任务; 自己那段做完后, 从剩余最多的进程那段的后半截"偷"一半
+- 每个进程同时最多有 prefetch 个块在途, 进程算完一块时下一块已经在管道里了
+
+    with WorkerPool() as pool:
+        results = pool.map(cpu_heavy, range(1000, 2000))
+"""
+
+import math
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def _worker_main(conn, initializer, initargs):
+    if initializer is not None:
+        initializer(*initargs)
+    conn.send(("ready", os.getpid()))
+    func = None
+    while True:
+        message = conn.recv()
+        kind = message[0]
+        if kind == "stop":
+            break
+        if kind == "ping":
+            conn.send(("pong",))
+        elif kind == "func":
+            func = message[1]
+        elif kind == "chunk":
+            _, chunk_id, items = message
+            start = time.perf_counter()
+            try:
+                results = [func(item) for item in items]
+            except BaseException as e:
+                conn.send(("error", chunk_id, e))
+            else:
+                conn.send(("done", chunk_id, results, time.perf_counter() - start))
+    conn.close()
+
+
+class _Range:
+    """某个进程还没发出去的任务下标 [lo, hi)"""
+
+    __slots__ = ("lo", "hi")
+
+    def __init__(self, lo: int, hi: int):
+        self.lo = lo
+        self.hi = hi
+
+    def __len__(self):
+        return self.hi - self.lo
+
+
+class WorkerPool:
+    """常驻进程池; 用 with 语句或 close() 关闭"""
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+        target_chunk_time: float = 0.02,
+        prefetch: int = 2,
+        start_method: Optional[str] = None,
+    ):
+        self.processes = processes or os.cpu_count() or 1
+        self.target_chunk_time = target_chunk_time
+        self.prefetch = prefetch
+        self._ctx = multiprocessing.get_context(start_method)
+
+        self._conns = []
+        self._procs = []
+        for _ in range(self.processes):
+            parent_conn, child_conn = self._ctx.Pipe()
+            proc = self._ctx.Process(target=_worker_main, args=(child_conn, initializer, initargs), daemon=True)
+            proc.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._procs.append(proc)
+
+        # 预热: 等所有进程就绪, 再测一次往返的调度开销
+        self.pids = [conn.recv()[1] for conn in self._conns]
+        self.dispatch_overhead = self._measure_dispatch_overhead()
+
+        self.chunks_sent = 0
+        self.steals = 0
+        self._closed = False
+        self._active = False  # 有没有 map / imap_unordered 正在进行
+
+    def _measure_dispatch_overhead(self, rounds: int = 20) -> float:
+        conn = self._conns[0]
+        start = time.perf_counter()
+        for _ in range(rounds):
+            conn.send(("ping",))
+            conn.recv()
+        return (time.perf_counter() - start) / rounds
+
+    # ---------- 调度 ----------
+
+    def _chunk_size(self, item_time: Optional[float], remaining: int) -> int:
+        if item_time is None:
+            return 1  # 还没有估计值: 先发单个任务试探
+        by_time = max(1, int(self.target_chunk_time / max(item_time, 1e-9)))
+        # 剩余任务平均分给所有进程后的一半: 越到最后块越小
+        by_balance = max(1, math.ceil(remaining / (2 * self.processes)))
+        return min(by_time, by_balance)
+
+    def _steal(self, thief: int, ranges: List[_Range]) -> bool:
+        victim = max(range(len(ranges)), key=lambda i: len(ranges[i]))
+        if len(ranges[victim]) < 2:
+            return False
+        # 拿走后半截: 被偷的进程继续做它前面的那一段, 两边都还是连续的下标
+        mid = ranges[victim].lo + len(ranges[victim]) // 2
+        ranges[thief] = _Range(mid, ranges[victim].hi)
+        ranges[victim].hi = mid
+        self.steals += 1
+        return True
+
+    def _run(self, func: Callable, items: List[Any], chunksize: Optional[int]) -> Iterator[Tuple[int, List[Any]]]:
+        """按完成顺序产出 (起始下标, 这一块的结果)"""
+        if self._closed:
+            raise RuntimeError("WorkerPool 已经关闭")
+        # 块编号和发给进程的 "func" 都是每次运行独立的, 两次运行交错会把结果分给错误的调用
+        if self._active:
+            raise RuntimeError("WorkerPool 同一时刻只能运行一个 map / imap_unordered")
+        self._active = True
+        try:
+            yield from self._run_chunks(func, items, chunksize)
+        finally:
+            self._active = False
+
+    def _run_chunks(self, func: Callable, items: List[Any], chunksize: Optional[int]) -> Iterator[Tuple[int, List[Any]]]:
+        if not items:
+            return
+
+        n = len(items)
+        per_worker = math.ceil(n / self.processes)
+        ranges = [_Range(min(i * per_worker, n), min((i + 1) * per_worker, n)) for i in range(self.processes)]
+        in_flight: Dict[int, Dict[int, int]] = {i: {} for i in range(self.processes)}  # 进程 -> {chunk_id: 起始下标}
+        remaining = n
+        item_time: Optional[float] = None
+        next_id = 0
+        error: Optional[BaseException] = None
+
+        for conn in self._conns:
+            conn.send(("func", func))
+
+        def dispatch(worker: int):
+            nonlocal next_id, remaining
+            while len(in_flight[worker]) < self.prefetch and error is None:
+                if not ranges[worker] and not self._steal(worker, ranges):
+                    return
+                size = chunksize or self._chunk_size(item_time, remaining)
+                r = ranges[worker]
+                lo, hi = r.lo, min(r.hi, r.lo + size)
+                r.lo = hi
+                remaining -= hi - lo
+                self._conns[worker].send(("chunk", next_id, items[lo:hi]))
+                in_flight[worker][next_id] = lo
+                next_id += 1
+                self.chunks_sent += 1
+
+        for worker in range(self.processes):
+            dispatch(worker)
+
+        conn_index = {id(conn): i for i, conn in enumerate(self._conns)}
+        try:
+            while any(in_flight.values()):
+                busy = [self._conns[w] for w in in_flight if in_flight[w]]
+                for conn in wait(busy):
+                    worker = conn_index[id(conn)]
+                    message = conn.recv()
+                    lo = in_flight[worker].pop(message[1])
+                    if message[0] == "error":
+                        error = error or message[2]  # 不再派发新块, 等在途的块收完再抛出
+                        continue
+                    _, _, results, elapsed = message
+                    # 单个任务耗时: 指数移动平均, 任务大小不均匀时也能跟上
+                    sample = elapsed / len(results)
+                    item_time = sample if item_time is None else 0.7 * item_time + 0.3 * sample
+                    dispatch(worker)
+                    if error is None:
+                        yield lo, results
+        finally:
+            # 调用者中途停止迭代时, 把在途的结果收掉, 下一次 map 不会读到旧结果
+            for worker, chunks in in_flight.items():
+                for _ in range(len(chunks)):
+                    self._conns[worker].recv()
+
+        if error is not None:
+            raise error
+
+    def map(self, func: Callable, iterable: Iterable, chunksize: Optional[int] = None) -> List[Any]:
+        """与内置 map 相同的顺序返回结果列表; func 必须能被 pickle (模块级函数)"""
+        items = list(iterable)
+        output: List[Any] = [None] * len(items)
+        for lo, results in self._run(func, items, chunksize):
+            output[lo:lo + len(results)] = results
+        return output
+
+    def imap_unordered(self, func: Callable, iterable: Iterable, chunksize: Optional[int] = None) -> Iterator[Any]:
+        """按完成顺序逐个产出结果"""
+        for _, results in self._run(func, list(iterable), chunksize):
+            yield from results
+
+    # ---------- 生命周期 ----------
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for conn in self._conns:
+            try:
+                conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join()
+        for conn in self._conns:
+            conn.close()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()